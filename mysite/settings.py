@@ -48,6 +48,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "polls.middleware.PublishedResultsMiddleware",
 ]
 
 ROOT_URLCONF = 'mysite.urls'
@@ -77,9 +78,57 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests instead of reconnecting
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Applied to every new SQLite connection (see polls/signals.py)
+SQLITE_PRAGMAS = [
+    'journal_mode = WAL',
+    'synchronous = NORMAL',
+    'cache_size = -20000',
+    'mmap_size = 268435456',
+    'temp_store = MEMORY',
+]
+
+# Warm up URL resolvers, templates, the database connection and caches when
+# mysite.wsgi or mysite.asgi is loaded (see mysite/warmup.py)
+WARMUP_ON_LOAD = config('WARMUP_ON_LOAD', default=True, cast=bool)
+# Newest open polls whose results are cached by the warm-up, besides the trending ones
+WARMUP_PREFILL_POLLS = config('WARMUP_PREFILL_POLLS', default=20, cast=int)
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Shared by all worker processes on this host (see polls/cache.py)
+
+CACHE_LOCATION = config('CACHE_LOCATION', default=str(BASE_DIR / 'cache.sqlite3'))
+CACHE_MAX_ENTRIES = config('CACHE_MAX_ENTRIES', default=10000, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'polls.cache.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': CACHE_MAX_ENTRIES,
+        },
+    },
+    # The same cache, for vote admission: a vote that has to wait for the
+    # cache writer during a flood of votes is shed instead
+    'admission': {
+        'BACKEND': 'polls.cache.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': CACHE_MAX_ENTRIES,
+            'LOCK_TIMEOUT': 0.05,
+        },
+    },
+}
+
+# Tests use a throwaway cache database instead of the shared one
+TEST_RUNNER = 'mysite.test_runner.TestRunner'
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -98,6 +147,22 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing: PASSWORD_HASHER is the algorithm used for new passwords
+# and PASSWORD_HASHER_COST its cost (0 for Django's default, see polls/hashers.py).
+# Passwords hashed with other settings are re-hashed when their user logs in.
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2_sha256': 'polls.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'polls.hashers.ScryptPasswordHasher',
+    'argon2': 'polls.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='pbkdf2_sha256')
+PASSWORD_HASHER_COST = config('PASSWORD_HASHER_COST', default=0, cast=int)
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -114,6 +179,30 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Serve the polls pages with the native async views (see polls/async_views.py)
+POLLS_ASYNC_VIEWS = config('POLLS_ASYNC_VIEWS', default=False, cast=bool)
+
+# Seconds the vote counts of a poll's results page are cached
+POLLS_RESULTS_CACHE_TIMEOUT = config('POLLS_RESULTS_CACHE_TIMEOUT', default=60, cast=int)
+
+# Admission control of votes (see polls/admission.py): votes processed at once
+# per worker, and the per-user token bucket refill rate (votes/s) and size
+POLLS_VOTE_MAX_INFLIGHT = config('POLLS_VOTE_MAX_INFLIGHT', default=8, cast=int)
+POLLS_VOTE_RATE = config('POLLS_VOTE_RATE', default=0.5, cast=float)
+POLLS_VOTE_BURST = config('POLLS_VOTE_BURST', default=5, cast=int)
+
+# Trending polls (see polls/trending.py): half-life of a vote in seconds, number
+# of trending polls, and seconds between saving the scores to the database
+POLLS_TRENDING_HALF_LIFE = config('POLLS_TRENDING_HALF_LIFE', default=6 * 60 * 60, cast=int)
+POLLS_TRENDING_SIZE = config('POLLS_TRENDING_SIZE', default=12, cast=int)
+POLLS_TRENDING_FLUSH_INTERVAL = config('POLLS_TRENDING_FLUSH_INTERVAL', default=30, cast=int)
+
+# Maximum number of polls listed for a search (see polls/search.py)
+POLLS_SEARCH_LIMIT = config('POLLS_SEARCH_LIMIT', default=50, cast=int)
+
+# Pre-rendered results pages of closed polls (see polls/publish.py)
+PUBLISHED_RESULTS_DIR = config('PUBLISHED_RESULTS_DIR', default=str(BASE_DIR / 'published'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
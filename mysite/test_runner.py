@@ -0,0 +1,34 @@
+"""
+Test runner of the project.
+
+The default cache is shared by every server running from this checkout (see
+polls/cache.py) and the tests clear it, so they get a throwaway cache
+database instead.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        # Aliases sharing a cache database keep sharing the throwaway one.
+        locations = {}
+        caches = {}
+        for alias, cache in settings.CACHES.items():
+            location = locations.setdefault(cache.get("LOCATION", ""), os.path.join(
+                self.cache_dir.name, f"cache{len(locations)}.sqlite3"))
+            caches[alias] = {**cache, "LOCATION": location}
+        self.cache_override = override_settings(CACHES=caches)
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        self.cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
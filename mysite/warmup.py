@@ -0,0 +1,131 @@
+"""
+Warm-up of a worker process when mysite.wsgi or mysite.asgi is loaded.
+
+Without it the first requests to every new worker pay for building the URL
+resolvers, compiling the templates, opening the database connection and
+filling the caches, which shows up as latency spikes after every deploy.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Q
+from django.template import engines
+from django.urls import get_resolver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Templates compiled ahead of the first request, relative to the template dirs.
+TEMPLATE_PATTERNS = ["polls/*.html", "registration/*.html"]
+
+
+def resolve_urls():
+    """Build the reverse lookup tables of every URL resolver."""
+    def populate(resolver):
+        resolver.reverse_dict
+        for _, namespace_resolver in resolver.namespace_dict.values():
+            populate(namespace_resolver)
+    populate(get_resolver())
+
+
+def compile_templates():
+    """Compile the polls and registration templates into the cached loader."""
+    for engine in engines.all():
+        names = set()
+        for directory in engine.template_dirs:
+            for pattern in TEMPLATE_PATTERNS:
+                names.update(str(path.relative_to(directory))
+                             for path in Path(directory).glob(pattern))
+        for name in sorted(names):
+            engine.get_template(name)
+
+
+def open_database():
+    """Open (and thereby tune) the database connection of this thread."""
+    connection.ensure_connection()
+
+
+def _discard_inherited_connections():
+    """
+    Make a worker forked from a warmed-up process (e.g. gunicorn --preload)
+    open its own database connections instead of sharing its parent's.
+    """
+    for inherited in connections.all(initialized_only=True):
+        inherited.connection = None
+
+
+os.register_at_fork(after_in_child=_discard_inherited_connections)
+
+
+def prefill_caches():
+    """
+    Load the trending scores and cache the results of the trending polls and
+    of the WARMUP_PREFILL_POLLS newest open polls.
+    """
+    from polls import trending
+    from polls.models import Question
+    from polls.views import cached_result_choices
+
+    now = timezone.now()
+    open_polls = Question.objects.filter(pub_date__lte=now).filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=now))
+    newest = open_polls.order_by("-pub_date")[:settings.WARMUP_PREFILL_POLLS]
+    question_ids = set(trending.tracker.top_ids())
+    question_ids.update(newest.values_list("pk", flat=True))
+    for question in open_polls.filter(pk__in=question_ids):
+        cached_result_choices(question)
+
+
+STEPS = [resolve_urls, compile_templates, open_database, prefill_caches]
+
+
+def _run_steps(steps):
+    timings = {}
+    for step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            # A failed warm-up step only costs latency; never fail the worker.
+            logger.warning("Warm-up step %s failed", step.__name__, exc_info=True)
+        timings[step.__name__] = time.perf_counter() - start
+    return timings
+
+
+def warm_up(open_connection=True):
+    """
+    Warm up this worker process.
+
+    ASGI servers may load the application inside their event loop, where the
+    ORM cannot be used, so the steps then run in a separate thread that
+    closes its connections when done.
+
+    Args:
+        open_connection: Whether to open the database connection of this
+            thread. mysite.asgi passes False: ASGI requests run their ORM
+            queries in a thread of their own, so a connection opened while
+            loading the application would never serve a request.
+
+    Returns:
+        The seconds taken by each step, by step name.
+    """
+    steps = [step for step in STEPS if open_connection or step is not open_database]
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return _run_steps(steps)
+
+    def run_in_thread():
+        try:
+            return _run_steps([step for step in steps if step is not open_database])
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run_in_thread).result()
@@ -1,22 +1,99 @@
+from django import forms
 from django.contrib import admin
+from django.core.cache import cache
+from django.utils import timezone
 
-from .models import Choice, Question
+from .models import Ballot, Choice, Question, Vote
+from . import search
+from .publish import refresh_published_results, unpublish_results
+from .views import results_cache_key
+
+
+class ChoiceInlineFormSet(forms.BaseInlineFormSet):
+
+    def clean(self):
+        """Refuse more choices than the ballot type can store."""
+        super().clean()
+        limit = self.instance.max_choice_slots()
+        if limit is None:
+            return
+        added = sum(1 for form in self.extra_forms
+                    if form.has_changed() and not self._should_delete_form(form))
+        if self.instance.choice_slots + added > limit:
+            raise forms.ValidationError(
+                f"A {self.instance.get_ballot_type_display().lower()} poll can have "
+                f"at most {limit} choices, including deleted ones.")
 
 
 class ChoiceInline(admin.StackedInline):
     model = Choice
+    formset = ChoiceInlineFormSet
     extra = 3
 
 
+class QuestionAdminForm(forms.ModelForm):
+
+    class Meta:
+        model = Question
+        fields = ["question_text", "ballot_type", "pub_date", "end_date"]
+
+    def clean_ballot_type(self):
+        """Votes and ballots of one type cannot be counted as another."""
+        ballot_type = self.cleaned_data["ballot_type"]
+        question = self.instance
+        if question.pk is None or ballot_type == question.ballot_type:
+            return ballot_type
+        has_votes = Vote.objects.filter(choice__question=question).exists()
+        if has_votes or Ballot.objects.filter(question=question).exists():
+            raise forms.ValidationError(
+                "The ballot type cannot be changed once the poll has votes.")
+        limit = Question(ballot_type=ballot_type).max_choice_slots()
+        if limit is not None and question.choice_slots > limit:
+            raise forms.ValidationError(
+                f"This ballot type allows at most {limit} choices, including deleted ones.")
+        return ballot_type
+
+    def clean_end_date(self):
+        """Archived questions cannot be reopened; their votes left the Vote table."""
+        end_date = self.cleaned_data["end_date"]
+        if self.instance.is_archived() and (end_date is None or end_date >= timezone.now()):
+            raise forms.ValidationError(
+                "This poll is archived and cannot be reopened; its end date must stay "
+                "in the past.")
+        return end_date
+
+
 class QuestionAdmin(admin.ModelAdmin):
+    form = QuestionAdminForm
     fieldsets = [
-        (None, {"fields": ["question_text"]}),
+        (None, {"fields": ["question_text", "ballot_type"]}),
         ("Date information", {"fields": ["pub_date", "end_date"], "classes": ["collapse"]}),
     ]
     inlines = [ChoiceInline]
     list_display = ["question_text", "pub_date", "end_date", "was_published_recently"]
-    list_filter = ["pub_date", "end_date"]
+    list_filter = ["pub_date", "end_date", "ballot_type"]
     search_fields = ["question_text"]
 
+    def get_search_results(self, request, queryset, search_term):
+        """Search the full-text index instead of scanning question_text."""
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_questions(queryset, search_term), False
+
+    def save_related(self, request, form, formsets, change):
+        """Re-render the published results page once the choices are saved."""
+        super().save_related(request, form, formsets, change)
+        cache.delete(results_cache_key(form.instance.pk))
+        refresh_published_results(form.instance)
+
+    def delete_model(self, request, obj):
+        unpublish_results(obj.pk)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for question_id in queryset.values_list("pk", flat=True):
+            unpublish_results(question_id)
+        super().delete_queryset(request, queryset)
+
 
 admin.site.register(Question, QuestionAdmin)
@@ -0,0 +1,229 @@
+"""
+Admission control for the vote endpoint.
+
+A flood of votes queues up behind SQLite's single writer and slows every
+request down, including reads. Votes are therefore admitted only while
+fewer than POLLS_VOTE_MAX_INFLIGHT of them are being processed by this
+worker, and each user draws from a token bucket kept in the cache that
+refills at POLLS_VOTE_RATE votes per second up to POLLS_VOTE_BURST. Tokens
+are taken with atomic cache.add() calls, so concurrent votes of a user never
+share a token, even across the workers sharing the cache. Votes
+over capacity are shed immediately with a 503 or 429 and a Retry-After
+header instead of queueing.
+
+Shedding a vote must stay cheap while the cache is busy with the flood:
+the bucket is read before anything is written to it, the metrics are
+counted in memory and added to the cache in batches, and the "admission"
+cache gives up on a busy cache writer after a few milliseconds (the vote is
+then shed with a 503).
+"""
+import functools
+import math
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+ADMITTED = "polls:metrics:votes_admitted"
+SHED_OVERLOAD = "polls:metrics:votes_shed_overload"
+SHED_RATE_LIMITED = "polls:metrics:votes_shed_rate_limited"
+
+# Seconds between two additions of the counts of a worker to the cache.
+METRICS_FLUSH_INTERVAL = 1.0
+
+
+def admission_cache():
+    """Returns the cache holding the token buckets and the metrics."""
+    return caches["admission"]
+
+
+class InFlightLimiter:
+    """Counts the votes being processed by this worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def try_acquire(self, limit):
+        """Returns True and takes a slot if fewer than limit are in flight."""
+        with self._lock:
+            if self.count >= limit:
+                return False
+            self.count += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.count -= 1
+
+
+inflight = InFlightLimiter()
+
+
+def add_to_counter(key, delta):
+    """Add to a metrics counter in the cache."""
+    cache = admission_cache()
+    if cache.add(key, delta, timeout=None):
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # The counter was evicted between add() and incr().
+        cache.add(key, delta, timeout=None)
+
+
+class Counters:
+    """
+    Metrics counts of this worker process that are not in the cache yet.
+    They are added to it at most every METRICS_FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._last_flush = time.monotonic()
+
+    def increment(self, key):
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+            flush_due = time.monotonic() - self._last_flush >= METRICS_FLUSH_INTERVAL
+        if flush_due:
+            self.flush()
+
+    def flush(self):
+        """Add the counts to the cache; counts that cannot be added are kept."""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._last_flush = time.monotonic()
+        try:
+            while counts:
+                key, delta = next(iter(counts.items()))
+                add_to_counter(key, delta)
+                del counts[key]
+        except sqlite3.OperationalError:
+            # The cache is busy; try again with the next flush.
+            with self._lock:
+                for key, delta in counts.items():
+                    self._counts[key] = self._counts.get(key, 0) + delta
+
+
+counters = Counters()
+
+
+def take_token(user_id, now=None):
+    """
+    Take one token from the bucket of a user.
+
+    The bucket is made of time slots of 1 / POLLS_VOTE_RATE seconds, counted
+    from the user's first vote. A vote claims the oldest free slot among the
+    last POLLS_VOTE_BURST ones with cache.add(), which only one caller can
+    win, so a new token becomes available every 1 / POLLS_VOTE_RATE seconds
+    and at most POLLS_VOTE_BURST are saved up.
+
+    Args:
+        user_id: The ID of the voting user.
+        now: The current time in seconds, for testing.
+
+    Returns:
+        0 if a token was taken, otherwise the seconds until one is available.
+    """
+    cache = admission_cache()
+    interval = 1 / settings.POLLS_VOTE_RATE
+    burst = settings.POLLS_VOTE_BURST
+    now = time.time() if now is None else now
+    anchor_key = f"polls:bucket:{user_id}"
+    anchor = cache.get(anchor_key)
+    if anchor is None:
+        cache.add(anchor_key, now, timeout=None)
+        anchor = cache.get(anchor_key, now)
+    current = math.floor((now - anchor) / interval)
+    # A slot can be claimed for burst intervals from its start.
+    timeout = math.ceil(burst * interval) + 1
+    keys = [f"{anchor_key}:{anchor!r}:{slot}" for slot in range(current - burst + 1, current + 1)]
+    # Only slots that look free are written to, so an empty bucket costs reads only.
+    claimed = cache.get_many(keys)
+    for key in keys:
+        if key not in claimed and cache.add(key, 1, timeout):
+            return 0
+    return anchor + (current + 1) * interval - now
+
+
+def _shed(status, retry_after, reason):
+    response = HttpResponse(reason, status=status, content_type="text/plain")
+    response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def admit(request):
+    """
+    Decide whether a vote is processed now.
+
+    Returns:
+        None if the vote is admitted and holds an in-flight slot that must be
+        released, otherwise the 503 or 429 response to send instead.
+    """
+    if not inflight.try_acquire(settings.POLLS_VOTE_MAX_INFLIGHT):
+        counters.increment(SHED_OVERLOAD)
+        return _shed(503, 1, "Too many votes are being processed, please retry.")
+    if request.user.is_authenticated:
+        try:
+            wait = take_token(request.user.pk)
+        except sqlite3.OperationalError:
+            # The cache writer is busy, so the server is overloaded.
+            inflight.release()
+            counters.increment(SHED_OVERLOAD)
+            return _shed(503, 1, "Too many votes are being processed, please retry.")
+        if wait:
+            inflight.release()
+            counters.increment(SHED_RATE_LIMITED)
+            return _shed(429, wait, "You are voting too fast, please retry.")
+    counters.increment(ADMITTED)
+    return None
+
+
+def admission_control(view):
+    """
+    Decorator that applies admission control to the POST requests of a
+    sync or async view.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method != "POST":
+                return await view(request, *args, **kwargs)
+            rejected = await sync_to_async(admit)(request)
+            if rejected is not None:
+                return rejected
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                inflight.release()
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != "POST":
+            return view(request, *args, **kwargs)
+        rejected = admit(request)
+        if rejected is not None:
+            return rejected
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            inflight.release()
+    return wrapper
+
+
+def metrics():
+    """Returns the admission counters of all workers as a dict."""
+    counters.flush()
+    counts = admission_cache().get_many([ADMITTED, SHED_OVERLOAD, SHED_RATE_LIMITED])
+    return {
+        "admitted": counts.get(ADMITTED, 0),
+        "shed_overload": counts.get(SHED_OVERLOAD, 0),
+        "shed_rate_limited": counts.get(SHED_RATE_LIMITED, 0),
+    }
@@ -1,6 +1,27 @@
+import importlib
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.urls import clear_url_caches
+
+
+def reload_poll_urls(*, setting, **kwargs):
+    """
+    Rebuild the URLconf when POLLS_ASYNC_VIEWS changes, e.g. through
+    override_settings() in tests and benchmarks.
+    """
+    if setting != "POLLS_ASYNC_VIEWS":
+        return
+    importlib.reload(importlib.import_module("polls.urls"))
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
 
 
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registers the signal handlers)
+        setting_changed.connect(reload_poll_urls)
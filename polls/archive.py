@@ -0,0 +1,71 @@
+"""
+Archival of closed polls.
+
+Once a question's end_date has passed its results can no longer change, so
+its final tallies are frozen into ChoiceSnapshot rows and its raw votes are
+moved out of the live Vote table, either into ArchivedVote or into a
+gzip-compressed CSV file. Ballots of multiple and ranked choice questions
+are already stored compactly outside the Vote table and stay where they are.
+"""
+import csv
+import gzip
+import os
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedVote, ChoiceSnapshot, Question, Vote
+
+
+def closed_questions(now=None):
+    """
+    Returns the questions that have ended and have not been archived yet.
+    """
+    now = now or timezone.now()
+    return Question.objects.filter(end_date__lt=now, archived_date__isnull=True)
+
+
+def archive_question(question, export_dir=None):
+    """
+    Freeze the results of a closed question and move its votes out of Vote.
+
+    Args:
+        question: The Question to archive. Its end_date must be in the past.
+        export_dir: If given, the raw votes are written to
+            ``<export_dir>/question_<id>.csv.gz`` instead of ArchivedVote.
+
+    Returns:
+        The number of votes moved out of the Vote table.
+    """
+    if question.can_vote() or question.end_date is None:
+        raise ValueError(f"Question {question.pk} is still open for voting.")
+
+    with transaction.atomic():
+        ChoiceSnapshot.objects.bulk_create([
+            ChoiceSnapshot(choice=choice, votes=choice.num_votes,
+                           is_winner=getattr(choice, "is_winner", False))
+            for choice in question.result_choices()
+        ])
+
+        votes = Vote.objects.filter(choice__question=question)
+
+        rows = list(votes.values_list("choice_id", "user_id"))
+        if export_dir:
+            os.makedirs(export_dir, exist_ok=True)
+            path = os.path.join(export_dir, f"question_{question.pk}.csv.gz")
+            with gzip.open(path, "wt", newline="") as archive:
+                writer = csv.writer(archive)
+                writer.writerow(["question_id", "choice_id", "user_id"])
+                writer.writerows((question.pk, choice_id, user_id)
+                                 for choice_id, user_id in rows)
+        else:
+            ArchivedVote.objects.bulk_create(
+                [ArchivedVote(question=question, choice_id=choice_id, user_id=user_id)
+                 for choice_id, user_id in rows],
+                batch_size=1000,
+            )
+        votes.delete()
+
+        question.archived_date = timezone.now()
+        question.save(update_fields=["archived_date"])
+    return len(rows)
@@ -0,0 +1,179 @@
+"""
+Native async variants of the polls views.
+
+They are selected with the POLLS_ASYNC_VIEWS setting and use the async ORM
+and cache APIs, so under ASGI a request is not handed to the thread-sensitive
+sync adapter for every query.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils import timezone
+
+from . import search, trending
+from .admission import admission_control
+from .models import Ballot, Choice, Question, Vote
+from .views import read_ballot, results_cache_key
+
+
+async def _load_user(request):
+    """
+    Returns the user of the request.
+
+    The user and session are loaded lazily with sync database queries, so
+    they have to be resolved in a thread before templates can use them.
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def index(request):
+    """
+    Displays a list of the published questions, newest first, or trending
+    first when the ``sort`` query parameter is "trending". The ``q`` query
+    parameter searches the questions instead, best match first.
+
+    Returns:
+        Rendered HTML page displaying the latest questions.
+    """
+    published = Question.objects.filter(pub_date__lte=timezone.now())
+    sort = request.GET.get("sort", "latest")
+    query = request.GET.get("q", "").strip()
+    if query:
+        latest_question_list = await sync_to_async(search.search)(published, query)
+        rest = published.none()
+    elif sort == "trending":
+        trending_ids = await sync_to_async(trending.tracker.top_ids)()
+        top = await published.ain_bulk(trending_ids)
+        latest_question_list = [top[pk] for pk in trending_ids if pk in top]
+        rest = published.exclude(pk__in=trending_ids).order_by('-pub_date')
+    else:
+        latest_question_list = []
+        rest = published.order_by('-pub_date')
+    latest_question_list += [question async for question in rest]
+    await _load_user(request)
+    context = {"latest_question_list": latest_question_list, "sort": sort, "query": query}
+    return render(request, "polls/index.html", context)
+
+
+async def detail(request, pk):
+    """
+    Displays the details of a specific question.
+
+    Args:
+        request: The HTTP request object.
+        pk: The ID of the question to display.
+
+    Returns:
+        Rendered HTML page displaying the question details.
+    """
+    await _load_user(request)
+    try:
+        question = await Question.objects.aget(pk=pk)
+    except Question.DoesNotExist:
+        messages.error(request, "The poll you requested does not exist.")
+        return redirect('polls:index')
+
+    if not question.can_vote():
+        messages.error(request, "Voting is not allowed for this poll.")
+        return redirect('polls:index')
+
+    choices = [choice async for choice in question.choice_set.all()]
+    return render(request, "polls/detail.html", {"question": question, "choices": choices})
+
+
+async def results(request, question_id):
+    """
+    Displays the results of a specific question.
+
+    Args:
+        request: The HTTP request object.
+        question_id: The ID of the question to display results for.
+
+    Returns:
+        Rendered HTML page displaying the question results.
+    """
+    try:
+        question = await Question.objects.aget(pk=question_id)
+    except Question.DoesNotExist:
+        raise Http404("No Question matches the given query.")
+
+    key = results_cache_key(question.id)
+    choices = await cache.aget(key)
+    if choices is None:
+        if question.ballot_type == Question.SINGLE or question.is_archived():
+            choices = [choice async for choice in question.result_choices()]
+        else:
+            # Ballots are tallied in memory by the sync tally engine.
+            choices = await sync_to_async(question.result_choices)()
+        await cache.aset(key, choices, settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    await _load_user(request)
+    return render(request, 'polls/results.html', {'question': question, 'choices': choices})
+
+
+def async_login_required(view):
+    """Async counterpart of django.contrib.auth.decorators.login_required."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await _load_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_login_required
+@admission_control
+async def vote(request, question_id):
+    """Vote for one of the answers to a question."""
+    user = request.user
+    try:
+        question = await Question.objects.aget(pk=question_id)
+    except Question.DoesNotExist:
+        messages.error(request, "The poll you requested does not exist.")
+        return redirect('polls:index')
+
+    if not question.can_vote():
+        messages.error(request, "Voting for this question is not allowed.")
+        return redirect('polls:index')
+
+    choices = [choice async for choice in question.choice_set.all()]
+    if request.method == "GET":
+        return render(request, 'polls/detail.html', {'question': question, 'choices': choices})
+
+    if question.ballot_type != Question.SINGLE:
+        try:
+            ballot = read_ballot(question, choices, request.POST)
+        except ValueError as error:
+            messages.error(request, str(error))
+            return render(request, 'polls/detail.html', {'question': question, 'choices': choices})
+        await Ballot.objects.aupdate_or_create(question=question, user=user, defaults=ballot)
+        success_message = "Your ballot has been saved."
+    else:
+        try:
+            selected_choice = await question.choice_set.aget(pk=request.POST["choice"])
+        except (KeyError, ValueError, Choice.DoesNotExist):
+            messages.error(request, "You didn't select a choice.")
+            return render(request, 'polls/detail.html',
+                          {'question': question, 'choices': choices})
+
+        try:
+            # Check if the user has already voted for this question
+            vote = await Vote.objects.aget(user=user, choice__question=question)
+            vote.choice = selected_choice
+            await vote.asave()
+        except Vote.DoesNotExist:
+            await Vote.objects.acreate(choice=selected_choice, user=user)
+        success_message = f"Your vote for {selected_choice} has been saved."
+
+    await cache.adelete(results_cache_key(question.id))
+    await sync_to_async(trending.tracker.record_vote)(question.id)
+    messages.success(request, success_message)
+    return HttpResponseRedirect(reverse("polls:results", args=(question.id,)))
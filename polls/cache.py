@@ -0,0 +1,219 @@
+"""
+Cache backend shared by all worker processes of a single host.
+
+Entries live in an SQLite database in WAL mode, so readers never block the
+writer and every worker sees the same results cache, counters and rate
+limits. ``incr`` is a single UPDATE statement, so it is atomic across
+processes. Expired entries are treated as missing and the least recently
+used entries are culled once there are more than MAX_ENTRIES.
+
+Requires SQLite 3.24 or later (for upserts). ``incr`` reads the new value
+with UPDATE ... RETURNING on SQLite 3.35 or later, and within the same
+write transaction as the UPDATE on older versions.
+
+A write waits up to the LOCK_TIMEOUT option (30 seconds by default) for
+another process to finish writing, then raises sqlite3.OperationalError.
+
+Usage in settings.py::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "polls.cache.SQLiteCache",
+            "LOCATION": "/var/tmp/ku-polls-cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 10000, "LOCK_TIMEOUT": 30},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS cache ("
+    " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)",
+]
+
+# A read refreshes the LRU time of an entry at most this often (seconds),
+# so that hot keys do not turn every read into a write.
+ACCESS_RESOLUTION = 1.0
+
+# Writes between two checks of the number of entries.
+CULL_CHECK_INTERVAL = 100
+
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+INCR_SQL = (
+    "UPDATE cache SET value = value + ?, accessed = ? "
+    "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?)"
+)
+
+
+def _encode(value):
+    """Integers are stored as such, so incr() can add to them in SQL."""
+    if type(value) is int and INT64_MIN <= value <= INT64_MAX:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """Cache backend storing its entries in an SQLite database in WAL mode."""
+
+    def __init__(self, location, params):
+        if sqlite3.sqlite_version_info < (3, 24, 0):
+            raise ImproperlyConfigured(
+                f"SQLiteCache requires SQLite 3.24 or later, found {sqlite3.sqlite_version}.")
+        super().__init__(params)
+        self._path = location
+        self._lock_timeout = params.get("OPTIONS", {}).get("LOCK_TIMEOUT", 30)
+        self._local = threading.local()
+
+    def _connection(self):
+        """Returns the connection of this thread, opened after any fork."""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=self._lock_timeout,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+            local.writes = 0
+        return local.connection
+
+    def _wrote(self):
+        """Count a write and cull the cache every CULL_CHECK_INTERVAL writes."""
+        self._local.writes += 1
+        if self._local.writes >= CULL_CHECK_INTERVAL:
+            self._local.writes = 0
+            self._cull()
+
+    def _cull(self):
+        connection = self._connection()
+        now = time.time()
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+        (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self._max_entries:
+            excess = count - self._max_entries
+            if self._cull_frequency:
+                excess = max(excess, count // self._cull_frequency)
+            else:
+                excess = count
+            connection.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed LIMIT ?)", (excess,))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, expires, accessed FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        now = time.time()
+        if expires is not None and expires <= now:
+            self._housekeep("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, now))
+            return default
+        if now - accessed >= ACCESS_RESOLUTION:
+            self._housekeep("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return _decode(value)
+
+    def _housekeep(self, sql, params):
+        """Run a write that a read can do without; skipped while the cache is busy."""
+        try:
+            self._connection().execute(sql, params)
+        except sqlite3.OperationalError:
+            pass
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._connection().execute(
+            "INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+            "expires = excluded.expires, accessed = excluded.accessed",
+            (key, _encode(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        self._wrote()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+            "expires = excluded.expires, accessed = excluded.accessed "
+            "WHERE cache.expires <= ?",
+            (key, _encode(value), self.get_backend_timeout(timeout), now, now),
+        )
+        if cursor.rowcount:
+            self._wrote()
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            "UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        connection = self._connection()
+        if HAS_RETURNING:
+            row = connection.execute(INCR_SQL + " RETURNING value",
+                                     (delta, now, key, now)).fetchone()
+        else:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = None
+                if connection.execute(INCR_SQL, (delta, now, key, now)).rowcount:
+                    row = connection.execute(
+                        "SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Connections are kept open for the lifetime of their thread.
+        pass
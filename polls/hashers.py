@@ -0,0 +1,34 @@
+"""
+Password hashers whose cost is set by the PASSWORD_HASHER_COST setting.
+
+They keep the algorithm names of Django's hashers, so existing password
+hashes stay valid. When PASSWORD_HASHER or PASSWORD_HASHER_COST changes,
+Django re-hashes a user's password with the new settings the next time
+they log in. A cost of 0 keeps Django's default.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256; the cost is the number of iterations."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHER_COST or hashers.PBKDF2PasswordHasher.iterations
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """scrypt; the cost is the CPU/memory work factor, a power of 2."""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_HASHER_COST or hashers.ScryptPasswordHasher.work_factor
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 (requires argon2-cffi); the cost is the number of passes."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_HASHER_COST or hashers.Argon2PasswordHasher.time_cost
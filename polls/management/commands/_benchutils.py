@@ -0,0 +1,48 @@
+"""Helpers shared by the benchmark management commands."""
+import os
+import statistics
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Run a benchmark against a throwaway test database, so that the
+    generated polls and users never touch the real one.
+
+    SQLite test databases are kept in a temporary file rather than in
+    memory, so that locking behaves like the real database.
+    """
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    old_test_name = test_settings.get("NAME")
+    tmp_dir = None
+    if connection.vendor == "sqlite":
+        tmp_dir = tempfile.TemporaryDirectory()
+        test_settings["NAME"] = os.path.join(tmp_dir.name, "benchmark.sqlite3")
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                                  serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings["NAME"] = old_test_name
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+def percentile(samples, pct):
+    """Returns the pct-th percentile of a list of samples."""
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+
+def latency_summary(samples):
+    """Returns p50/p95/p99/max of latencies in seconds, formatted in ms."""
+    return "p50={:.2f}ms p95={:.2f}ms p99={:.2f}ms max={:.2f}ms".format(
+        percentile(samples, 50) * 1000, percentile(samples, 95) * 1000,
+        percentile(samples, 99) * 1000, max(samples) * 1000,
+    )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from polls.archive import archive_question, closed_questions
+
+
+class Command(BaseCommand):
+    help = ("Freeze the results of closed polls into snapshots and move "
+            "their votes out of the live Vote table.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--export-dir",
+            help="Write archived votes as gzip-compressed CSV files to this "
+                 "directory instead of the ArchivedVote table.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only list the polls that would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        questions = closed_questions()
+        total = 0
+        for question in questions:
+            if options["dry_run"]:
+                self.stdout.write(f"Would archive: {question}")
+                continue
+            moved = archive_question(question, export_dir=options["export_dir"])
+            total += moved
+            self.stdout.write(f"Archived {question} ({moved} votes)")
+        if not options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Moved {total} votes out of the Vote table."))
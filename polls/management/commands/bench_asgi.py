@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from polls.models import Choice, Question
+
+from ._benchutils import benchmark_database, latency_summary
+
+CSRF_TOKEN = "b" * 32
+
+
+async def asgi_request(application, method, path, cookies, body=b""):
+    """
+    Send one HTTP request straight to an ASGI application.
+
+    Returns:
+        The response status code.
+    """
+    headers = [
+        (b"host", b"localhost"),
+        (b"cookie", cookies.encode()),
+        (b"x-csrftoken", CSRF_TOKEN.encode()),
+    ]
+    if body:
+        headers.append((b"content-type", b"application/x-www-form-urlencoded"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "headers": headers,
+        "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Never disconnect; the application stops listening once it responds.
+        await asyncio.Event().wait()
+
+    status = None
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await application(scope, receive, send)
+    return status
+
+
+def adapted_middleware():
+    """
+    Returns the messages Django logs when it has to put sync-only middleware
+    of the ASGI handler behind the sync adapter.
+    """
+    messages = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            if "adapted for middleware" in record.getMessage():
+                messages.append(record.getMessage())
+
+    logger = logging.getLogger("django.request")
+    handler, old_level = Collect(), logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    try:
+        with override_settings(DEBUG=True):
+            ASGIHandler()
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(old_level)
+    return messages
+
+
+class Command(BaseCommand):
+    help = ("Compare throughput and tail latency of the sync and async polls "
+            "views under ASGI at high concurrency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--polls", type=int, default=20)
+        parser.add_argument("--vote-ratio", type=float, default=0.1,
+                            help="Fraction of requests that are votes.")
+
+    def handle(self, *args, **options):
+        # Sync-only middleware would put every request, async views included,
+        # behind the sync adapter and make the comparison meaningless.
+        for message in adapted_middleware():
+            self.stderr.write(f"warning: {message}")
+        with benchmark_database():
+            cookies, targets = self.populate(options["polls"])
+            for async_views in (False, True):
+                # Compare the views themselves, not the vote admission control.
+                with override_settings(POLLS_ASYNC_VIEWS=async_views, DEBUG=False,
+                                       POLLS_VOTE_MAX_INFLIGHT=10**6,
+                                       POLLS_VOTE_BURST=10**6, POLLS_VOTE_RATE=10**6):
+                    latencies, statuses, elapsed = asyncio.run(
+                        self.run_load(cookies, targets, options))
+                label = "async" if async_views else "sync"
+                errors = sum(1 for status in statuses if status >= 500)
+                self.stdout.write(
+                    f"{label:>5}: {len(latencies) / elapsed:8.1f} req/s  "
+                    f"{latency_summary(latencies)}  errors={errors}")
+
+    def populate(self, polls):
+        """Create open polls and a logged in voter. Returns cookies and targets."""
+        user = User.objects.create_user(username="benchmark", password="benchmark")
+        targets = []
+        for n in range(polls):
+            question = Question.objects.create(
+                question_text=f"Benchmark poll {n}",
+                pub_date=timezone.now() - timezone.timedelta(days=1))
+            choices = [Choice.objects.create(question=question, choice_text=f"Choice {c}")
+                       for c in range(4)]
+            targets.append((question.id, [choice.id for choice in choices]))
+        client = Client()
+        client.force_login(user)
+        session = client.cookies["sessionid"].value
+        return f"sessionid={session}; csrftoken={CSRF_TOKEN}", targets
+
+    async def run_load(self, cookies, targets, options):
+        """Issue the requests with a fixed number of concurrent clients."""
+        from mysite.asgi import application
+
+        queue = asyncio.Queue()
+        for _ in range(options["requests"]):
+            question_id, choice_ids = random.choice(targets)
+            if random.random() < options["vote_ratio"]:
+                body = f"choice={random.choice(choice_ids)}".encode()
+                queue.put_nowait(("POST", f"/polls/{question_id}/vote/", body))
+            else:
+                path = random.choice(["/polls/", f"/polls/detail/{question_id}/",
+                                      f"/polls/results/{question_id}/"])
+                queue.put_nowait(("GET", path, b""))
+
+        latencies, statuses = [], []
+
+        async def worker():
+            while not queue.empty():
+                method, path, body = queue.get_nowait()
+                start = time.perf_counter()
+                statuses.append(await asgi_request(application, method, path, cookies, body))
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(options["concurrency"])))
+        return latencies, statuses, time.perf_counter() - start
@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from ._benchutils import benchmark_database
+
+PASSWORD = "BenchmarkPassword!42"
+
+
+class Command(BaseCommand):
+    help = ("Measure signups/sec and logins/sec of a single process (one core) "
+            "with the configured password hasher.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+
+    def rate(self, label, count, run):
+        start = time.perf_counter()
+        for n in range(count):
+            run(n)
+        per_second = count / (time.perf_counter() - start)
+        self.stdout.write(f"{label:<46} {per_second:8.1f}/s")
+
+    def handle(self, *args, **options):
+        count = options["users"]
+        hasher = get_hasher()
+        self.stdout.write(f"hasher {hasher.algorithm}, "
+                          f"cost {settings.PASSWORD_HASHER_COST or 'default'}")
+        client = Client(HTTP_HOST="localhost")
+
+        def signup(n):
+            response = client.post(reverse("signup"), {
+                "username": f"signup{n}", "password1": PASSWORD, "password2": PASSWORD})
+            if response.status_code != 302:
+                raise CommandError(f"Signup failed with status {response.status_code}.")
+            client.logout()
+
+        def signup_and_authenticate(n):
+            # The previous signup flow: save the form, then authenticate again.
+            form = UserCreationForm({
+                "username": f"previous{n}", "password1": PASSWORD, "password2": PASSWORD})
+            form.is_valid()
+            form.save()
+            authenticate(username=f"previous{n}", password=PASSWORD)
+
+        def login(n):
+            response = client.post(reverse("login"), {
+                "username": f"signup{n}", "password": PASSWORD})
+            if response.status_code != 302:
+                raise CommandError(f"Login failed with status {response.status_code}.")
+            client.logout()
+
+        with benchmark_database():
+            self.rate("password hashes", count, lambda n: hasher.encode(PASSWORD, hasher.salt()))
+            self.rate("signups (view, hashes once)", count, signup)
+            self.rate("signups (save + authenticate, hashes twice)", count,
+                      signup_and_authenticate)
+            self.rate("logins (view)", count, login)
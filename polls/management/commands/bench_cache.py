@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from polls.cache import SQLiteCache
+
+from ._benchutils import benchmark_database
+
+BACKENDS = {
+    "sqlite": SQLiteCache,
+    "file": FileBasedCache,
+    "database": DatabaseCache,
+}
+COUNTER = "bench:counter"
+
+
+def run_worker(backend, location, operations, seed):
+    """
+    Run a mix of cache operations in a worker process.
+
+    Returns:
+        The number of increments made and the seconds it took.
+    """
+    connections.close_all()  # never share the parent's database connection
+    cache = BACKENDS[backend](location, {"OPTIONS": {"MAX_ENTRIES": 100_000}})
+    rng = random.Random(seed)
+    increments = 0
+    start = time.perf_counter()
+    for _ in range(operations):
+        roll = rng.random()
+        key = f"bench:{rng.randrange(1000)}"
+        if roll < 0.8:
+            cache.get(key)
+        elif roll < 0.9:
+            cache.set(key, ("results", rng.random()), timeout=60)
+        else:
+            try:
+                cache.incr(COUNTER)
+                increments += 1
+            except ValueError:
+                pass
+    return increments, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = ("Compare cache backends shared by several worker processes: "
+            "throughput and whether concurrent increments are lost.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 4)
+        parser.add_argument("--operations", type=int, default=5000,
+                            help="Operations per process (80%% get, 10%% set, 10%% incr).")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        context = multiprocessing.get_context("fork")
+        with benchmark_database(), tempfile.TemporaryDirectory() as tmp_dir:
+            call_command("createcachetable", "bench_cache_table", verbosity=0)
+            locations = {
+                "sqlite": os.path.join(tmp_dir, "cache.sqlite3"),
+                "file": os.path.join(tmp_dir, "file-cache"),
+                "database": "bench_cache_table",
+            }
+            connections.close_all()
+            for backend, location in locations.items():
+                cache = BACKENDS[backend](location, {})
+                cache.set(COUNTER, 0, timeout=None)
+                with context.Pool(processes) as pool:
+                    start = time.perf_counter()
+                    results = pool.starmap(run_worker, [
+                        (backend, location, options["operations"], seed)
+                        for seed in range(processes)
+                    ])
+                    elapsed = time.perf_counter() - start
+                increments = sum(count for count, _ in results)
+                lost = increments - cache.get(COUNTER)
+                total = processes * options["operations"]
+                self.stdout.write(
+                    f"{backend:>8}: {total / elapsed:9.0f} ops/s with {processes} processes, "
+                    f"{lost} of {increments} increments lost")
+                connections.close_all()
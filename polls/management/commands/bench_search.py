@@ -0,0 +1,70 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from polls import search
+from polls.models import Choice, Question
+
+from ._benchutils import benchmark_database, latency_summary
+
+
+class Command(BaseCommand):
+    help = ("Compare the full-text poll search with an icontains scan of "
+            "question_text.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError("The full-text search index requires SQLite.")
+        rng = random.Random(options["seed"])
+        vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+                      for _ in range(5000)]
+
+        with benchmark_database():
+            self.populate(rng, vocabulary, options["questions"])
+            start = time.perf_counter()
+            search.rebuild_index()
+            self.stdout.write(f"rebuild index of {options['questions']} polls: "
+                              f"{time.perf_counter() - start:.2f}s")
+
+            terms = [rng.choice(vocabulary) for _ in range(options["queries"])]
+            questions = Question.objects.all()
+            self.report("fts5 search (ranked, top 50)",
+                        lambda term: search.search(questions, term), terms)
+            self.report("fts5 prefix search (3 letters)",
+                        lambda term: search.search(questions, term[:3]), terms)
+            self.report("icontains scan (newest 50)",
+                        lambda term: list(questions.filter(question_text__icontains=term)
+                                          .order_by("-pub_date")[:50]),
+                        terms)
+
+    def populate(self, rng, vocabulary, count):
+        """Create polls with random words and three choices each."""
+        now = timezone.now()
+        batch = 5000
+        for start in range(0, count, batch):
+            created = Question.objects.bulk_create([
+                Question(question_text=" ".join(rng.choices(vocabulary, k=8)), pub_date=now,
+                         choice_slots=3)
+                for _ in range(min(batch, count - start))
+            ])
+            Choice.objects.bulk_create([
+                Choice(question=question, choice_text=" ".join(rng.choices(vocabulary, k=2)),
+                       slot=slot)
+                for question in created for slot in range(3)
+            ])
+
+    def report(self, label, run, terms):
+        latencies = []
+        for term in terms:
+            start = time.perf_counter()
+            run(term)
+            latencies.append(time.perf_counter() - start)
+        self.stdout.write(f"{label:<34} {latency_summary(latencies)}")
@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import tally
+
+
+class Command(BaseCommand):
+    help = "Benchmark tallying multiple and ranked choice ballots."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ballots", type=int, default=1_000_000)
+        parser.add_argument("--choices", type=int, default=8)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def timed(self, label, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<40} {elapsed * 1000:10.1f} ms")
+        return result
+
+    def handle(self, *args, **options):
+        n_ballots, n_choices = options["ballots"], options["choices"]
+        rng = np.random.default_rng(options["seed"])
+        self.stdout.write(f"{n_ballots} ballots, {n_choices} choices")
+
+        masks = rng.integers(0, 1 << n_choices, size=n_ballots, dtype=np.int64)
+        counts = self.timed("multiple choice: count_selections", tally.count_selections,
+                            masks, n_choices)
+        mask_list = masks.tolist()
+        reference = self.timed("multiple choice: python loop", self.python_count,
+                               mask_list, n_choices)
+        if list(counts) != reference:
+            raise CommandError("count_selections() disagrees with the python loop.")
+
+        # Every ballot ranks a random number of the choices in random order.
+        order = np.argsort(rng.random((n_ballots, n_choices)), axis=1).astype(np.uint8)
+        lengths = rng.integers(1, n_choices + 1, size=n_ballots)
+        rankings = [row[:length].tobytes() for row, length in zip(order, lengths)]
+        ranks = self.timed("ranked choice: pack_rankings", tally.pack_rankings, rankings)
+        rounds, winner = self.timed("ranked choice: instant_runoff", tally.instant_runoff,
+                                    ranks, n_choices)
+        self.stdout.write(f"instant runoff: {len(rounds)} rounds, winner is choice {winner}")
+
+    @staticmethod
+    def python_count(masks, n_choices):
+        """Count selections one ballot at a time, for comparison."""
+        counts = [0] * n_choices
+        for mask in masks:
+            for position in range(n_choices):
+                if mask >> position & 1:
+                    counts[position] += 1
+        return counts
@@ -0,0 +1,87 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question
+
+# Runs in a fresh interpreter: loads mysite.wsgi like a new worker would and
+# times the first and second request to each path given on the command line.
+CHILD = """
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+from mysite.wsgi import application
+timings = {"load": time.perf_counter() - start}
+
+def request(path):
+    environ = {"PATH_INFO": path, "HTTP_HOST": "localhost"}
+    setup_testing_defaults(environ)
+    start = time.perf_counter()
+    body = application(environ, lambda status, headers, exc_info=None: None)
+    for _ in body:
+        pass
+    body.close()
+    return time.perf_counter() - start
+
+for path in sys.argv[1:]:
+    timings[path] = [request(path), request(path)]
+print(json.dumps(timings))
+"""
+
+
+class Command(BaseCommand):
+    help = ("Profile the cold start of a WSGI worker: time to load mysite.wsgi and "
+            "the first and second request per page, with and without warm-up.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+
+    def paths(self):
+        paths = [reverse("polls:index"), reverse("login")]
+        now = timezone.now()
+        question = Question.objects.filter(pub_date__lte=now, end_date__gte=now).first()
+        if question is not None:
+            paths += [reverse("polls:detail", args=(question.id,)),
+                      reverse("polls:results", args=(question.id,))]
+        return paths
+
+    def start_worker(self, warm_up, paths):
+        # Every worker starts from an empty cache of its own, like after a
+        # deploy, and never touches the cache shared by running servers.
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = dict(os.environ, WARMUP_ON_LOAD=str(warm_up),
+                       CACHE_LOCATION=os.path.join(cache_dir, "cache.sqlite3"))
+            process = subprocess.run([sys.executable, "-c", CHILD, *paths], env=env,
+                                     cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise CommandError(f"The worker failed:\n{process.stderr}")
+        return json.loads(process.stdout.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        paths = self.paths()
+        runs = {False: [], True: []}
+        for _ in range(options["runs"]):
+            for warm_up in runs:
+                runs[warm_up].append(self.start_worker(warm_up, paths))
+
+        def median_ms(samples):
+            return f"{statistics.median(samples) * 1000:9.1f}ms"
+
+        for warm_up, results in runs.items():
+            self.stdout.write(f"warm-up {'on' if warm_up else 'off'} "
+                              f"(median of {len(results)} workers)")
+            load = median_ms([r["load"] for r in results])
+            self.stdout.write(f"  {'load mysite.wsgi':<28} {load}")
+            for path in paths:
+                first = median_ms([r[path][0] for r in results])
+                second = median_ms([r[path][1] for r in results])
+                self.stdout.write(f"  {path:<28} first {first}  second {second}")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls.models import Question
+from polls.publish import publish_results, published_path
+
+
+class Command(BaseCommand):
+    help = "Render the results page of every closed poll to a static file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Re-render pages that were already published.",
+        )
+
+    def handle(self, *args, **options):
+        published = 0
+        for question in Question.objects.filter(end_date__lt=timezone.now()):
+            if not options["force"] and published_path(question.pk).exists():
+                continue
+            publish_results(question)
+            published += 1
+        self.stdout.write(self.style.SUCCESS(f"Published {published} results pages."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of the polls."
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError("The full-text search index requires SQLite.")
+        indexed = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} polls."))
@@ -0,0 +1,81 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+
+from .publish import published_path
+
+
+def results_question_id(path):
+    """
+    Returns the question id of a results page path, or None for any other
+    path, without resolving the path against the whole URLconf.
+    """
+    prefix, suffix = reverse("polls:results", args=(0,)).rsplit("0", 1)
+    if not (path.startswith(prefix) and path.endswith(suffix)):
+        return None
+    question_id = path[len(prefix):len(path) - len(suffix)]
+    if not (question_id.isascii() and question_id.isdigit()):
+        return None
+    return int(question_id)
+
+
+class PublishedResultsMiddleware:
+    """
+    Serve the pre-rendered results page of a closed poll directly from disk.
+
+    Requests for polls without a published page fall through to the normal
+    results view. The middleware is async-capable, so under ASGI it does not
+    put the async views behind the sync adapter.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.published_response(request)
+        if response is not None:
+            return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Published pages are small files read in one go, which is cheaper
+        # than handing the request to a thread.
+        response = self.published_response(request)
+        if response is not None:
+            return response
+        return await self.get_response(request)
+
+    def published_response(self, request):
+        """
+        Returns a response with the published results page requested, or
+        None if the request is not for a published page.
+        """
+        if request.method not in ("GET", "HEAD"):
+            return None
+        question_id = results_question_id(request.path)
+        if question_id is None:
+            return None
+
+        accepts_gzip = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+        path = published_path(question_id, compressed=accepts_gzip)
+        try:
+            content = path.read_bytes()
+            modified = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+        response = HttpResponse(content, content_type="text/html; charset=utf-8")
+        if accepts_gzip:
+            response["Content-Encoding"] = "gzip"
+        response["Content-Length"] = str(len(content))
+        response["Last-Modified"] = http_date(modified)
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
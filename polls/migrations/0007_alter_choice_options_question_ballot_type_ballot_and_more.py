@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0006_trendingscore'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='choice',
+            options={'ordering': ['pk']},
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='ballot_type',
+            field=models.CharField(choices=[('single', 'Single choice'), ('multiple', 'Multiple choice'), ('ranked', 'Ranked choice')], default='single', max_length=8),
+        ),
+        migrations.CreateModel(
+            name='Ballot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selection', models.BigIntegerField(default=0)),
+                ('ranking', models.BinaryField(default=b'', max_length=255)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ballot',
+            constraint=models.UniqueConstraint(fields=('question', 'user'), name='unique_ballot_per_user'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the FTS5 index of polls/search.py (SQLite only)."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE polls_question_fts USING fts5("
+        "question_text, choice_text, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO polls_question_fts (rowid, question_text, choice_text) "
+        "SELECT q.id, q.question_text, "
+        "COALESCE((SELECT group_concat(c.choice_text, ' ') FROM polls_choice c "
+        "WHERE c.question_id = q.id), '') "
+        "FROM polls_question q"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE polls_question_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_alter_choice_options_question_ballot_type_ballot_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
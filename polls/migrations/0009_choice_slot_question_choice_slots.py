@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-19 22:05
+
+from django.db import migrations, models
+
+
+def assign_choice_slots(apps, schema_editor):
+    """Give existing choices their current position as slot, as ballots use it."""
+    Question = apps.get_model("polls", "Question")
+    Choice = apps.get_model("polls", "Choice")
+    for question in Question.objects.all():
+        choices = list(Choice.objects.filter(question=question).order_by("pk"))
+        for slot, choice in enumerate(choices):
+            choice.slot = slot
+        Choice.objects.bulk_update(choices, ["slot"])
+        question.choice_slots = len(choices)
+        question.save(update_fields=["choice_slots"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_question_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='choice_slots',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='choice',
+            name='slot',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(assign_choice_slots, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='choice',
+            name='slot',
+            field=models.PositiveSmallIntegerField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='choice',
+            constraint=models.UniqueConstraint(fields=('question', 'slot'), name='unique_choice_slot'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 22:40
+
+from django.db import migrations, models
+
+from polls import tally
+
+
+def mark_archived_winners(apps, schema_editor):
+    """Find the winners of ranked polls archived before snapshots kept them."""
+    Question = apps.get_model("polls", "Question")
+    Ballot = apps.get_model("polls", "Ballot")
+    ChoiceSnapshot = apps.get_model("polls", "ChoiceSnapshot")
+    archived = Question.objects.filter(ballot_type="ranked", archived_date__isnull=False)
+    for question in archived:
+        slots = question.choice_slots
+        snapshots = ChoiceSnapshot.objects.filter(choice__question=question)
+        withdrawn = set(range(slots)) - set(snapshots.values_list("choice__slot", flat=True))
+        rankings = Ballot.objects.filter(question=question).values_list("ranking", flat=True)
+        rounds, winner = tally.instant_runoff(tally.pack_rankings(rankings), slots, withdrawn)
+        if winner is not None:
+            snapshots.filter(choice__slot=winner).update(is_winner=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_choice_slot_question_choice_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choicesnapshot',
+            name='is_winner',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_archived_winners, migrations.RunPython.noop),
+    ]
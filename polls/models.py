@@ -1,17 +1,35 @@
 import datetime
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib import admin
 from django.contrib.auth.models import User
 
+from . import tally
+
 
 class Question(models.Model):
     """
     Model representing a poll question.
     """
+    SINGLE = "single"
+    MULTIPLE = "multiple"
+    RANKED = "ranked"
+    BALLOT_TYPES = [
+        (SINGLE, "Single choice"),
+        (MULTIPLE, "Multiple choice"),
+        (RANKED, "Ranked choice"),
+    ]
+
     question_text = models.CharField(max_length=200)
+    ballot_type = models.CharField(max_length=8, choices=BALLOT_TYPES, default=SINGLE)
     pub_date = models.DateTimeField("date published")
     end_date = models.DateTimeField("end date", null=True, blank=True)
+    archived_date = models.DateTimeField("archived date", null=True, blank=True,
+                                         editable=False)
+    # Number of choice slots handed out so far, see Choice.slot.
+    choice_slots = models.PositiveSmallIntegerField(default=0, editable=False)
 
     def __str__(self):
         """
@@ -41,12 +59,82 @@ class Question(models.Model):
     def can_vote(self):
         """
         Returns True if the question can be voted on, False otherwise.
+        Archived questions stay closed even if their end_date is moved.
         """
+        if self.is_archived():
+            return False
         now = timezone.now()
         if self.end_date is None:
             return self.pub_date <= now
         return self.pub_date <= now <= self.end_date
 
+    def is_archived(self):
+        """
+        Returns True if the final results of the question were frozen into
+        a snapshot by the ``archive_polls`` command.
+        """
+        return self.archived_date is not None
+
+    def is_closed(self):
+        """
+        Returns True if the end_date of the question has passed.
+        """
+        return self.end_date is not None and self.end_date < timezone.now()
+
+    def max_choice_slots(self):
+        """
+        Returns how many choices a question of this ballot type can ever
+        have, or None if there is no limit.
+        """
+        if self.ballot_type == self.MULTIPLE:
+            return tally.MAX_SELECT_CHOICES
+        if self.ballot_type == self.RANKED:
+            return tally.MAX_RANKED_CHOICES
+        return None
+
+    def allocate_choice_slot(self):
+        """Returns a new choice slot of the question; slots are never reused."""
+        with transaction.atomic():
+            Question.objects.filter(pk=self.pk).update(choice_slots=F("choice_slots") + 1)
+            self.refresh_from_db(fields=["choice_slots"])
+        return self.choice_slots - 1
+
+    def result_choices(self):
+        """
+        Returns the choices of the question ready for displaying results.
+
+        Each choice is annotated with its vote count as ``num_votes``, so
+        the results of single choice questions are computed in a single
+        query. Ballots of multiple and ranked choice questions are tallied in
+        memory; for ranked choice questions ``num_votes`` is the count of the
+        final instant-runoff round and the winner has ``is_winner`` set.
+        """
+        choices = self.choice_set.all()
+        if self.is_archived():
+            # Results of archived questions come from their frozen snapshot.
+            return choices.annotate(num_votes=Coalesce("snapshot__votes", 0),
+                                    is_winner=Coalesce("snapshot__is_winner", Value(False)))
+        if self.ballot_type == self.SINGLE:
+            return choices.annotate(num_votes=Count("vote"))
+
+        choices = list(choices)
+        ballots = Ballot.objects.filter(question=self)
+        slots = self.choice_slots
+        winner = None
+        if self.ballot_type == self.MULTIPLE:
+            counts = tally.count_selections(
+                ballots.values_list("selection", flat=True), slots)
+        else:
+            # Slots of deleted choices take no part in the runoff.
+            withdrawn = set(range(slots)) - {choice.slot for choice in choices}
+            ranks = tally.pack_rankings(ballots.values_list("ranking", flat=True))
+            rounds, winner = tally.instant_runoff(ranks, slots, withdrawn)
+            counts = rounds[-1]
+        for choice in choices:
+            choice.num_votes = int(counts[choice.slot])
+            choice.is_winner = choice.slot == winner
+        return choices
+
 
 class Choice(models.Model):
     """
@@ -54,6 +142,16 @@ class Choice(models.Model):
     """
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    # Ballots refer to choices by their slot, a number handed out by the
+    # question when the choice is created (see polls/signals.py) and never
+    # reused, so deleting a choice does not move the votes of the others.
+    slot = models.PositiveSmallIntegerField(editable=False)
+
+    class Meta:
+        ordering = ["pk"]
+        constraints = [
+            models.UniqueConstraint(fields=["question", "slot"], name="unique_choice_slot"),
+        ]
 
     def __str__(self):
         """
@@ -61,10 +159,6 @@ class Choice(models.Model):
         """
         return self.choice_text
 
-    @property
-    def votes(self):
-        return Vote.objects.filter(choice=self).count()
-
 
 class Vote(models.Model):
     """Records a Vote of a Choice by a User"""
@@ -73,3 +167,62 @@ class Vote(models.Model):
 
     def str(self):
         return str(self.user) + " voted for " + str(self.choice)
+
+
+class Ballot(models.Model):
+    """
+    A User's ballot for a multiple or ranked choice Question.
+
+    The choices are stored compactly by their slot (Choice.slot):
+    ``selection`` is a bitmask of the selected choices, and ``ranking``
+    holds one byte per ranked choice, most preferred first.
+    See polls/tally.py.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    selection = models.BigIntegerField(default=0)
+    ranking = models.BinaryField(max_length=tally.MAX_RANKED_CHOICES, default=b"")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["question", "user"], name="unique_ballot_per_user"),
+        ]
+
+    def __str__(self):
+        return f"Ballot of {self.user} for {self.question}"
+
+
+class ChoiceSnapshot(models.Model):
+    """Final result of a Choice, frozen when its question was archived."""
+    choice = models.OneToOneField(Choice, on_delete=models.CASCADE,
+                                  primary_key=True, related_name="snapshot")
+    votes = models.PositiveIntegerField(default=0)
+    is_winner = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.choice}: {self.votes}"
+
+
+class ArchivedVote(models.Model):
+    """A Vote moved out of the live Vote table after its question closed."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    def __str__(self):
+        return str(self.user) + " voted for " + str(self.choice)
+
+
+class TrendingScore(models.Model):
+    """
+    Persisted trending score of a Question.
+
+    The score is stored as the log of the sum of exp(rate * vote_time) over
+    its votes, which only grows, so votes from several workers can be merged
+    without knowing when the score was last decayed. See polls/trending.py.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True)
+    log_score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.question}: {self.log_score}"
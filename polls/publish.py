@@ -0,0 +1,73 @@
+"""
+Pre-rendered results pages for closed polls.
+
+The results of a closed poll can no longer change, so its results page is
+rendered once to a static HTML file (plus a gzip-compressed copy) in
+``settings.PUBLISHED_RESULTS_DIR``. PublishedResultsMiddleware serves these
+files without touching the database.
+"""
+import gzip
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+
+def published_path(question_id, compressed=False):
+    """
+    Returns the path of the published results page of a question.
+    """
+    name = f"results_{question_id}.html" + (".gz" if compressed else "")
+    return Path(settings.PUBLISHED_RESULTS_DIR) / name
+
+
+def _write_atomic(path, data):
+    """Write data to path so that readers never see a partial file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def publish_results(question):
+    """
+    Render the results page of a closed question to a static file.
+
+    Args:
+        question: The closed Question to publish.
+
+    Returns:
+        The path of the published HTML file.
+    """
+    if not question.is_closed():
+        raise ValueError(f"Question {question.pk} is not closed.")
+    html = render_to_string("polls/results.html", {
+        "question": question,
+        "choices": question.result_choices(),
+    }).encode("utf-8")
+
+    path = published_path(question.pk)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(path, html)
+    _write_atomic(published_path(question.pk, compressed=True),
+                  gzip.compress(html, compresslevel=9, mtime=0))
+    return path
+
+
+def unpublish_results(question_id):
+    """
+    Remove the published results page of a question, if there is one.
+    """
+    for compressed in (False, True):
+        published_path(question_id, compressed).unlink(missing_ok=True)
+
+
+def refresh_published_results(question):
+    """
+    Re-render the published page of a question after it was edited, or
+    remove it if the question is no longer closed.
+    """
+    if question.is_closed():
+        publish_results(question)
+    else:
+        unpublish_results(question.pk)
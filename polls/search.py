@@ -0,0 +1,134 @@
+"""
+Full-text search of polls.
+
+On SQLite, the question text and choice texts of every question are indexed
+in the FTS5 virtual table polls_question_fts, whose rowid is the question's
+ID. The index is kept in sync by the signal handlers in polls/signals.py and
+can be rebuilt with the ``rebuild_search_index`` command. Other databases
+fall back to a case-insensitive substring scan.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "polls_question_fts"
+
+# Matches of the question text weigh more than matches of its choices.
+RANK = f"bm25({FTS_TABLE}, 2.0, 1.0)"
+
+INDEX_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, question_text, choice_text)
+    SELECT q.id, q.question_text,
+           COALESCE((SELECT group_concat(c.choice_text, ' ') FROM polls_choice c
+                     WHERE c.question_id = q.id), '')
+    FROM polls_question q
+"""
+
+
+def fts_available():
+    """Returns True if the database supports the FTS5 search index."""
+    return connection.vendor == "sqlite"
+
+
+def match_expression(query):
+    """
+    Returns the FTS5 query matching all words of a search, each as a
+    prefix, or None if the search has no words.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def index_question(question_id):
+    """(Re)index the question and choice texts of a question."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [question_id])
+        cursor.execute(INDEX_SQL + " WHERE q.id = %s", [question_id])
+
+
+def remove_question(question_id):
+    """Remove a deleted question from the index."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [question_id])
+
+
+def rebuild_index():
+    """
+    Rebuild the whole index from the questions and choices.
+
+    Returns:
+        The number of indexed questions.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(INDEX_SQL)
+        indexed = cursor.rowcount
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def filter_questions(queryset, query):
+    """
+    Returns the questions of a queryset that match a search, unordered.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    if not fts_available():
+        return substring_filter(queryset, query)
+    matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                     [expression])
+    return queryset.filter(pk__in=matches)
+
+
+def substring_filter(queryset, query):
+    """Returns the questions whose question or choice texts contain the search."""
+    return queryset.filter(
+        Q(question_text__icontains=query) | Q(choice__choice_text__icontains=query)
+    ).distinct()
+
+
+def search(queryset, query, limit=None):
+    """
+    Search the questions of a queryset.
+
+    Args:
+        queryset: The questions to search, e.g. only the published ones.
+        query: The words to search for. Words match as prefixes.
+        limit: The maximum number of results; POLLS_SEARCH_LIMIT by default.
+
+    Returns:
+        A list of the matching questions, best match first.
+    """
+    limit = limit or settings.POLLS_SEARCH_LIMIT
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    if not fts_available():
+        return list(substring_filter(queryset, query).order_by("-pub_date")[:limit])
+
+    # The queryset is applied before ranking and limiting, so that questions
+    # outside of it cannot take the places of the ones inside. It is joined
+    # on the matches rather than tested with rowid IN (...), which would let
+    # SQLite look up every candidate in the index instead of running MATCH.
+    candidates, params = (queryset.order_by().values(candidate_id=F("pk"))
+                          .query.sql_with_params())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} "
+            f"CROSS JOIN ({candidates}) candidate ON candidate.candidate_id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s ORDER BY {RANK} LIMIT %s",
+            [*params, expression, limit],
+        )
+        ranked_ids = [row[0] for row in cursor.fetchall()]
+    questions = queryset.in_bulk(ranked_ids)
+    return [questions[pk] for pk in ranked_ids if pk in questions]
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search
+from .models import Choice, Question
+
+
+@receiver(pre_save, sender=Choice)
+def assign_choice_slot(sender, instance, raw=False, **kwargs):
+    """
+    Give a new choice its slot. This also runs for choices loaded from a
+    fixture, which are saved without calling Choice.save().
+    """
+    if instance.slot is not None:
+        return
+    if raw and instance.pk is not None:
+        # A fixture loaded over existing rows keeps their slots.
+        instance.slot = (Choice.objects.filter(pk=instance.pk)
+                         .values_list("slot", flat=True).first())
+    if instance.slot is None:
+        instance.slot = instance.question.allocate_choice_slot()
+
+
+@receiver(pre_save, sender=Question)
+def keep_choice_slots(sender, instance, raw=False, **kwargs):
+    """A fixture loaded over an existing question must not hand out its slots again."""
+    if raw and instance.pk is not None:
+        stored = (Question.objects.filter(pk=instance.pk)
+                  .values_list("choice_slots", flat=True).first())
+        instance.choice_slots = max(instance.choice_slots, stored or 0)
+
+
+@receiver(post_save, sender=Question)
+def index_saved_question(sender, instance, **kwargs):
+    search.index_question(instance.pk)
+
+
+@receiver(post_delete, sender=Question)
+def remove_deleted_question(sender, instance, **kwargs):
+    search.remove_question(instance.pk)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def index_changed_choice(sender, instance, **kwargs):
+    search.index_question(instance.question_id)
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    """Apply the SQLITE_PRAGMAS settings to every new SQLite connection."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for pragma in settings.SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {pragma}")
@@ -0,0 +1,132 @@
+"""
+Tally engine for multi-select and ranked ballots.
+
+Ballots refer to choices by their position, the slot a choice is given when
+it is created (Choice.slot). Slots are never reused, so the positions of
+deleted choices are simply left out:
+
+* A multi-select ballot is a bitmask where bit i is set if the i-th choice
+  was selected, so a question can have at most MAX_SELECT_CHOICES choices.
+* A ranked ballot is a byte string of choice positions in order of
+  preference. Rankings are padded with NO_RANK to a rectangular array for
+  tallying.
+
+Counting and instant-runoff rounds run over all ballots at once with numpy.
+"""
+import numpy as np
+
+MAX_SELECT_CHOICES = 63
+NO_RANK = 255
+MAX_RANKED_CHOICES = NO_RANK
+
+# Number of bitmasks unpacked at a time when counting selections.
+CHUNK_SIZE = 1 << 16
+
+
+def selection_mask(positions):
+    """Returns the bitmask of a multi-select ballot."""
+    mask = 0
+    for position in positions:
+        if not 0 <= position < MAX_SELECT_CHOICES:
+            raise ValueError(f"A multiple choice poll can have at most "
+                             f"{MAX_SELECT_CHOICES} choices.")
+        mask |= 1 << position
+    return mask
+
+
+def pack_ranking(positions):
+    """Returns the packed bytes of a ranked ballot."""
+    if any(not 0 <= position < MAX_RANKED_CHOICES for position in positions):
+        raise ValueError(f"A ranked choice poll can have at most "
+                         f"{MAX_RANKED_CHOICES} choices.")
+    return bytes(positions)
+
+
+def count_selections(masks, n_choices):
+    """
+    Count how many multi-select ballots selected each choice.
+
+    Args:
+        masks: Iterable or array of ballot bitmasks.
+        n_choices: Number of choices of the question.
+
+    Returns:
+        Array with the number of selections of each choice.
+    """
+    if not isinstance(masks, np.ndarray):
+        masks = np.fromiter(masks, dtype=np.int64)
+    masks = masks.astype("<i8", copy=False)
+    counts = np.zeros(64, dtype=np.int64)
+    for start in range(0, len(masks), CHUNK_SIZE):
+        chunk = masks[start:start + CHUNK_SIZE].view(np.uint8).reshape(-1, 8)
+        counts += np.unpackbits(chunk, axis=1, bitorder="little").sum(axis=0, dtype=np.int64)
+    return counts[:n_choices]
+
+
+def pack_rankings(rankings):
+    """
+    Returns ranked ballots as a 2D uint8 array, one row per ballot, padded
+    with NO_RANK.
+    """
+    rankings = [bytes(ranking) for ranking in rankings]
+    width = max(map(len, rankings), default=0) or 1
+    padding = bytes([NO_RANK])
+    packed = b"".join(ranking.ljust(width, padding) for ranking in rankings)
+    return np.frombuffer(packed, dtype=np.uint8).reshape(-1, width)
+
+
+def instant_runoff(ranks, n_choices, withdrawn=()):
+    """
+    Run an instant-runoff election.
+
+    Every round counts each ballot for its most preferred choice that is
+    still in the race. A choice with a majority of those votes wins;
+    otherwise the choice with the fewest votes is eliminated (the earliest
+    one on ties) and only the ballots that counted for it move on to their
+    next preference.
+
+    Args:
+        ranks: 2D uint8 array of rankings, as returned by pack_rankings().
+        n_choices: Number of choice positions of the question.
+        withdrawn: Positions below n_choices that are not in the race, such
+            as those of deleted choices.
+
+    Returns:
+        A tuple of the vote counts of every round, as arrays, and the
+        position of the winning choice, or None if there are no ballots.
+    """
+    ranks = np.asarray(ranks, dtype=np.uint8)
+    width = ranks.shape[1]
+    columns = np.arange(width)
+    eliminated = np.zeros(256, dtype=bool)
+    eliminated[n_choices:] = True  # padding and unknown choices
+    eliminated[list(withdrawn)] = True
+
+    def next_preference(rows, start):
+        """Returns the column and choice of the first preference in the race."""
+        candidates = ranks[rows]
+        in_race = ~eliminated[candidates] & (columns >= start[:, None])
+        found = in_race.any(axis=1)
+        column = in_race.argmax(axis=1)
+        choice = candidates[np.arange(len(rows)), column]
+        return np.where(found, column, width), np.where(found, choice, NO_RANK)
+
+    rows = np.arange(len(ranks))
+    column, current = next_preference(rows, np.zeros(len(ranks), dtype=np.intp))
+    rounds = []
+    while True:
+        counts = np.bincount(current, minlength=256)[:n_choices]
+        rounds.append(counts)
+
+        total = int(counts.sum())
+        remaining = np.flatnonzero(~eliminated[:n_choices])
+        if total == 0 or len(remaining) == 0:
+            return rounds, None
+        leader = remaining[np.argmax(counts[remaining])]
+        if counts[leader] * 2 > total or len(remaining) == 1:
+            return rounds, int(leader)
+
+        loser = remaining[np.argmin(counts[remaining])]
+        eliminated[loser] = True
+        moved = np.flatnonzero(current == loser)
+        column[moved], current[moved] = next_preference(moved, column[moved] + 1)
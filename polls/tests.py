@@ -1,12 +1,39 @@
+import asyncio
 import datetime
-
-from django.test import TestCase
+import gzip
+import importlib
+import multiprocessing
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.forms import inlineformset_factory
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from django.urls import reverse
+from django.urls import resolve, reverse
+from django.contrib.admin.sites import site as admin_site
 from django.contrib.auth.models import User
-from mysite import settings
+from mysite import settings, warmup
+from mysite.warmup import warm_up
 
-from .models import Question, Choice
+from . import hashers
+from .admin import ChoiceInlineFormSet, QuestionAdminForm
+from .cache import SQLiteCache
+from .models import ArchivedVote, Ballot, Question, Choice, TrendingScore, Vote
+from . import admission, async_views, search, tally
+from .trending import tracker
+from .middleware import PublishedResultsMiddleware, results_question_id
+from .publish import published_path, refresh_published_results
+from .views import results_cache_key
 
 
 class QuestionModelTests(TestCase):
@@ -268,3 +295,697 @@ class UserAuthTest(TestCase):
         # should be redirected to the login page
         login_with_next = f"{reverse('login')}?next={vote_url}"
         self.assertRedirects(response, login_with_next)
+
+
+class ArchivePollsTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.users = [User.objects.create_user(username=f"voter{n}", password="FatChance!")
+                      for n in range(3)]
+        self.closed = Question.objects.create(
+            question_text="Closed question",
+            pub_date=timezone.now() - datetime.timedelta(days=7),
+            end_date=timezone.now() - datetime.timedelta(days=1),
+        )
+        self.open = create_question(question_text="Open question", days=-1)
+        for question in (self.closed, self.open):
+            yes = Choice.objects.create(question=question, choice_text="Yes")
+            no = Choice.objects.create(question=question, choice_text="No")
+            Vote.objects.create(choice=yes, user=self.users[0])
+            Vote.objects.create(choice=yes, user=self.users[1])
+            Vote.objects.create(choice=no, user=self.users[2])
+
+    def test_archive_moves_votes_of_closed_polls(self):
+        """Only the votes of closed polls leave the Vote table."""
+        call_command("archive_polls", stdout=StringIO())
+        self.closed.refresh_from_db()
+        self.assertTrue(self.closed.is_archived())
+        self.assertFalse(Vote.objects.filter(choice__question=self.closed).exists())
+        self.assertEqual(3, Vote.objects.filter(choice__question=self.open).count())
+        self.assertEqual(3, ArchivedVote.objects.filter(question=self.closed).count())
+
+    def test_archived_results_read_from_snapshot(self):
+        """The results page shows the frozen counts of an archived poll."""
+        call_command("archive_polls", stdout=StringIO())
+        response = self.client.get(reverse("polls:results", args=(self.closed.id,)))
+        self.assertContains(response, "2 votes")
+        self.assertContains(response, "1 vote<")
+        self.closed.refresh_from_db()
+        counts = {choice.choice_text: choice.num_votes for choice in self.closed.result_choices()}
+        self.assertEqual({"Yes": 2, "No": 1}, counts)
+
+    def test_archive_to_compressed_file(self):
+        """Archived votes can be exported to a gzip file instead of a table."""
+        with tempfile.TemporaryDirectory() as export_dir:
+            call_command("archive_polls", export_dir=export_dir,
+                         stdout=StringIO())
+            with gzip.open(f"{export_dir}/question_{self.closed.id}.csv.gz", "rt") as archive:
+                lines = archive.read().splitlines()
+        self.assertEqual(4, len(lines))
+        self.assertFalse(ArchivedVote.objects.exists())
+        self.assertFalse(Vote.objects.filter(choice__question=self.closed).exists())
+
+    def test_archived_poll_cannot_be_reopened(self):
+        """Extending the end date of an archived poll does not reopen it."""
+        call_command("archive_polls", stdout=StringIO())
+        self.closed.refresh_from_db()
+        form = QuestionAdminForm({
+            "question_text": self.closed.question_text,
+            "ballot_type": self.closed.ballot_type,
+            "pub_date": self.closed.pub_date,
+            "end_date": timezone.now() + datetime.timedelta(days=7),
+        }, instance=self.closed)
+        self.assertIn("end_date", form.errors)
+        self.closed.end_date = timezone.now() + datetime.timedelta(days=7)
+        self.assertFalse(self.closed.can_vote())
+
+
+class PublishedResultsTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.publish_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.publish_dir.cleanup)
+        settings_override = override_settings(PUBLISHED_RESULTS_DIR=self.publish_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.question = Question.objects.create(
+            question_text="Closed question",
+            pub_date=timezone.now() - datetime.timedelta(days=7),
+            end_date=timezone.now() - datetime.timedelta(days=1),
+        )
+        Choice.objects.create(question=self.question, choice_text="Published choice")
+        self.url = reverse("polls:results", args=(self.question.id,))
+
+    def test_publish_closed_polls(self):
+        """Closed polls get a static page and a gzip-compressed copy."""
+        open_question = create_question(question_text="Open question", days=-1)
+        call_command("publish_results", stdout=StringIO())
+        self.assertTrue(published_path(self.question.id).exists())
+        self.assertTrue(published_path(self.question.id, compressed=True).exists())
+        self.assertFalse(published_path(open_question.id).exists())
+
+    def test_published_page_served_without_queries(self):
+        """A published results page is served without touching the database."""
+        call_command("publish_results", stdout=StringIO())
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Published choice")
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual("gzip", response["Content-Encoding"])
+        self.assertIn(b"Published choice", gzip.decompress(response.content))
+
+    def test_reopened_poll_is_unpublished(self):
+        """Editing a published poll so that it is open again removes its page."""
+        call_command("publish_results", stdout=StringIO())
+        self.question.end_date = timezone.now() + datetime.timedelta(days=1)
+        self.question.save()
+        refresh_published_results(self.question)
+        self.assertFalse(published_path(self.question.id).exists())
+        response = self.client.get(self.url)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertContains(response, "Published choice")
+
+    def test_only_results_paths_are_looked_up(self):
+        """Only results page paths are checked for a published page."""
+        self.assertEqual(self.question.id, results_question_id(self.url))
+        detail_url = reverse("polls:detail", args=(self.question.id,))
+        self.assertIsNone(results_question_id(detail_url))
+        self.assertIsNone(results_question_id(self.url + "extra/"))
+
+    async def test_published_page_served_natively_under_asgi(self):
+        """Under ASGI the middleware runs as async middleware, not through an adapter."""
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(PublishedResultsMiddleware(get_response)))
+        await sync_to_async(call_command)("publish_results", stdout=StringIO())
+        response = await self.async_client.get(self.url)
+        self.assertContains(response, "Published choice")
+
+
+@override_settings(POLLS_ASYNC_VIEWS=True)
+class AsyncViewsTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        admission.counters.flush()
+        cache.clear()
+        self.user = User.objects.create_user(username="asyncuser", password="FatChance!")
+        self.question = create_question(question_text="Async question", days=-1)
+        self.choice = Choice.objects.create(question=self.question, choice_text="Async choice")
+
+    def test_urls_use_async_views(self):
+        """POLLS_ASYNC_VIEWS routes the polls urls to the async views."""
+        match = resolve(reverse("polls:results", args=(self.question.id,)))
+        self.assertIs(async_views.results, match.func)
+
+    async def test_index_and_detail(self):
+        """The async index and detail views render the published question."""
+        response = await self.async_client.get(reverse("polls:index"))
+        self.assertContains(response, "Async question")
+        response = await self.async_client.get(reverse("polls:detail", args=(self.question.id,)))
+        self.assertContains(response, "Async choice")
+
+    async def test_vote_requires_login(self):
+        """Unauthenticated votes are redirected to the login page."""
+        vote_url = reverse("polls:vote", args=(self.question.id,))
+        response = await self.async_client.post(vote_url, {"choice": self.choice.id})
+        self.assertRedirects(response, f"{reverse('login')}?next={vote_url}",
+                             fetch_redirect_response=False)
+        counts = await sync_to_async(admission.metrics)()
+        self.assertEqual(0, counts["admitted"])
+
+    async def test_vote_updates_results(self):
+        """A vote through the async view is counted on the results page."""
+        results_url = reverse("polls:results", args=(self.question.id,))
+        response = await self.async_client.get(results_url)
+        self.assertContains(response, "0 votes")
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.post(
+            reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice.id})
+        self.assertRedirects(response, results_url, fetch_redirect_response=False)
+        response = await self.async_client.get(results_url)
+        self.assertContains(response, "1 vote<")
+
+
+class VoteAdmissionTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        admission.counters.flush()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter", password="FatChance!")
+        self.client.force_login(self.user)
+        self.question = create_question(question_text="Busy question", days=-1)
+        self.choice = Choice.objects.create(question=self.question, choice_text="Busy choice")
+        self.vote_url = reverse("polls:vote", args=(self.question.id,))
+
+    @override_settings(POLLS_VOTE_BURST=2, POLLS_VOTE_RATE=0.1)
+    def test_rate_limited_votes_are_shed(self):
+        """Votes beyond the user's token bucket get a 429 with Retry-After."""
+        for _ in range(2):
+            response = self.client.post(self.vote_url, {"choice": self.choice.id})
+            self.assertEqual(302, response.status_code)
+        response = self.client.post(self.vote_url, {"choice": self.choice.id})
+        self.assertEqual(429, response.status_code)
+        self.assertEqual("10", response["Retry-After"])
+        self.assertEqual(1, Vote.objects.count())
+
+    @override_settings(POLLS_VOTE_MAX_INFLIGHT=0)
+    def test_overload_sheds_votes_but_not_reads(self):
+        """Votes over the in-flight limit get a 503; pages still render."""
+        response = self.client.post(self.vote_url, {"choice": self.choice.id})
+        self.assertEqual(503, response.status_code)
+        self.assertIn("Retry-After", response)
+        self.assertFalse(Vote.objects.exists())
+        response = self.client.get(self.vote_url)
+        self.assertContains(response, "Busy choice")
+        self.assertEqual(0, admission.inflight.count)
+
+    def test_token_bucket_refills(self):
+        """A user's bucket refills at POLLS_VOTE_RATE tokens per second."""
+        with self.settings(POLLS_VOTE_BURST=1, POLLS_VOTE_RATE=0.5):
+            self.assertEqual(0, admission.take_token(self.user.pk, now=100.0))
+            self.assertEqual(2.0, admission.take_token(self.user.pk, now=100.0))
+            self.assertEqual(0, admission.take_token(self.user.pk, now=102.0))
+
+    def test_concurrent_votes_do_not_share_tokens(self):
+        """Votes of a user arriving at the same time each need their own token."""
+        with self.settings(POLLS_VOTE_BURST=3, POLLS_VOTE_RATE=0.1):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                waits = list(executor.map(
+                    lambda _: admission.take_token(self.user.pk, now=100.0), range(20)))
+        self.assertEqual(3, waits.count(0))
+
+    @override_settings(POLLS_VOTE_BURST=1, POLLS_VOTE_RATE=0.1)
+    def test_metrics(self):
+        """Admitted and shed votes are exposed as metrics."""
+        for _ in range(3):
+            self.client.post(self.vote_url, {"choice": self.choice.id})
+        response = self.client.get(reverse("polls:metrics"))
+        self.assertContains(response, "polls_votes_admitted_total 1\n")
+        self.assertContains(response, 'polls_votes_shed_total{reason="rate_limited"} 2\n')
+
+    @override_settings(POLLS_VOTE_BURST=1, POLLS_VOTE_RATE=0.1)
+    def test_shed_votes_do_not_write_to_the_cache(self):
+        """Rate limited votes only read the bucket; counts are added in batches."""
+        self.client.post(self.vote_url, {"choice": self.choice.id})
+        admission_cache = admission.admission_cache()
+        with mock.patch.object(admission, "METRICS_FLUSH_INTERVAL", 3600), \
+                mock.patch.object(admission_cache, "add") as add, \
+                mock.patch.object(admission_cache, "incr") as incr:
+            for _ in range(3):
+                response = self.client.post(self.vote_url, {"choice": self.choice.id})
+                self.assertEqual(429, response.status_code)
+        self.assertFalse(add.called or incr.called)
+        self.assertEqual(3, admission.metrics()["shed_rate_limited"])
+
+    def test_busy_cache_sheds_vote(self):
+        """A vote is shed with a 503 instead of waiting for a busy cache writer."""
+        with mock.patch.object(admission, "take_token",
+                               side_effect=sqlite3.OperationalError("database is locked")):
+            response = self.client.post(self.vote_url, {"choice": self.choice.id})
+        self.assertEqual(503, response.status_code)
+        self.assertEqual(0, admission.inflight.count)
+        self.assertFalse(Vote.objects.exists())
+
+
+@override_settings(POLLS_TRENDING_HALF_LIFE=3600, POLLS_TRENDING_SIZE=2)
+class TrendingTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        tracker.reset()
+        self.addCleanup(tracker.reset)
+        self.old = create_question(question_text="Old favourite", days=-3)
+        self.busy = create_question(question_text="Busy now", days=-2)
+        self.newest = create_question(question_text="Newest", days=-1)
+        self.now = timezone.now().timestamp()
+
+    def test_recent_votes_outrank_old_votes(self):
+        """Votes decay, so a few recent votes beat many old ones."""
+        for _ in range(10):
+            tracker.record_vote(self.old.id, now=self.now - 5 * 3600)
+        tracker.record_vote(self.busy.id, now=self.now)
+        tracker.record_vote(self.busy.id, now=self.now)
+        self.assertEqual([self.busy.id, self.old.id], tracker.top_ids())
+        scores = dict(tracker.top(now=self.now))
+        self.assertAlmostEqual(2.0, scores[self.busy.id])
+        self.assertAlmostEqual(10 / 32, scores[self.old.id])
+
+    def test_top_list_is_bounded(self):
+        """Only the POLLS_TRENDING_SIZE best questions are kept in the list."""
+        for question, votes in ((self.old, 1), (self.busy, 3), (self.newest, 2)):
+            for _ in range(votes):
+                tracker.record_vote(question.id, now=self.now)
+        self.assertEqual([self.busy.id, self.newest.id], tracker.top_ids())
+
+    def test_scores_are_persisted(self):
+        """Flushed scores survive a restart of the tracker."""
+        tracker.record_vote(self.old.id, now=self.now)
+        tracker.record_vote(self.old.id, now=self.now)
+        tracker.record_vote(self.newest.id, now=self.now)
+        tracker.flush()
+        self.assertEqual(2, TrendingScore.objects.count())
+        tracker.reset()
+        self.assertEqual([self.old.id, self.newest.id], tracker.top_ids())
+
+    def test_votes_outside_top_list_count_after_flush(self):
+        """Only the top-K is kept in memory; other scores are merged on flush."""
+        for question, votes in ((self.old, 4), (self.busy, 2), (self.newest, 1)):
+            for _ in range(votes):
+                tracker.record_vote(question.id, now=self.now)
+        tracker.flush()
+        tracker.reset()
+        tracker.record_vote(self.newest.id, now=self.now)
+        tracker.record_vote(self.newest.id, now=self.now)
+        self.assertEqual([self.old.id, self.busy.id], tracker.top_ids())
+        tracker.flush()
+        self.assertEqual([self.old.id, self.newest.id], tracker.top_ids())
+
+    def test_flush_runs_in_background(self):
+        """A vote that makes a flush due does not wait for the database write."""
+        with mock.patch("polls.trending.threading.Thread") as thread:
+            tracker.record_vote(self.old.id, now=time.time() + 3600)
+            tracker.record_vote(self.old.id, now=time.time() + 3600)
+        thread.assert_called_once_with(target=tracker._background_flush, daemon=True)
+        self.assertFalse(TrendingScore.objects.exists())
+
+    def test_trending_index_does_not_query_votes(self):
+        """The trending index lists trending polls first without reading Vote."""
+        tracker.record_vote(self.old.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("polls:index"), {"sort": "trending"})
+        self.assertQuerysetEqual(response.context["latest_question_list"],
+                                 [self.old, self.newest, self.busy])
+        self.assertFalse(any("polls_vote" in query["sql"] for query in queries))
+
+
+class TallyTests(SimpleTestCase):
+
+    def test_count_selections(self):
+        """Each bit of a multi-select ballot counts for one choice."""
+        counts = tally.count_selections([0b101, 0b011, 1 << 62], 63)
+        self.assertEqual([2, 1, 1], list(counts[:3]))
+        self.assertEqual(1, counts[62])
+
+    def test_instant_runoff(self):
+        """Votes of eliminated choices move to the next preference."""
+        ranks = tally.pack_rankings([b"\x00\x01", b"\x01\x02", b"\x02\x01",
+                                     b"\x02\x00", b"\x00"])
+        rounds, winner = tally.instant_runoff(ranks, 3)
+        self.assertEqual([[2, 1, 2], [2, 0, 3]], [list(counts) for counts in rounds])
+        self.assertEqual(2, winner)
+
+    def test_instant_runoff_without_ballots(self):
+        """There is no winner without ballots."""
+        rounds, winner = tally.instant_runoff(tally.pack_rankings([]), 3)
+        self.assertIsNone(winner)
+
+
+class BallotVoteTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="ballotuser", password="FatChance!")
+        self.client.force_login(self.user)
+
+    def create_poll(self, ballot_type):
+        question = Question.objects.create(
+            question_text=f"{ballot_type} question", ballot_type=ballot_type,
+            pub_date=timezone.now() - datetime.timedelta(days=1))
+        choices = [Choice.objects.create(question=question, choice_text=text)
+                   for text in ("Red", "Green", "Blue")]
+        return question, choices
+
+    def test_multiple_choice_vote(self):
+        """A multiple choice vote stores one bitmask and counts every choice."""
+        question, (red, green, blue) = self.create_poll(Question.MULTIPLE)
+        response = self.client.post(reverse("polls:vote", args=(question.id,)),
+                                    {"choice": [red.id, blue.id]})
+        self.assertRedirects(response, reverse("polls:results", args=(question.id,)))
+        self.assertEqual(0b101, Ballot.objects.get(user=self.user).selection)
+        self.assertFalse(Vote.objects.exists())
+        counts = {choice.choice_text: choice.num_votes for choice in question.result_choices()}
+        self.assertEqual({"Red": 1, "Green": 0, "Blue": 1}, counts)
+
+    def test_ranked_choice_vote(self):
+        """A ranked vote stores the choices in order of preference."""
+        question, (red, green, blue) = self.create_poll(Question.RANKED)
+        self.client.post(reverse("polls:vote", args=(question.id,)),
+                         {f"rank_{blue.id}": "1", f"rank_{red.id}": "2"})
+        self.assertEqual(b"\x02\x00", bytes(Ballot.objects.get(user=self.user).ranking))
+        response = self.client.get(reverse("polls:results", args=(question.id,)))
+        self.assertContains(response, "Winner")
+        winners = [choice for choice in response.context["choices"] if choice.is_winner]
+        self.assertEqual([blue], winners)
+
+    def test_duplicate_rank_is_rejected(self):
+        """The same rank cannot be given to two choices."""
+        question, (red, green, blue) = self.create_poll(Question.RANKED)
+        response = self.client.post(reverse("polls:vote", args=(question.id,)),
+                                    {f"rank_{blue.id}": "1", f"rank_{red.id}": "1"})
+        self.assertContains(response, "Each rank can only be given to one choice.")
+        self.assertFalse(Ballot.objects.exists())
+
+    def test_deleting_a_choice_keeps_other_votes(self):
+        """Ballots refer to choice slots, which do not move when a choice is deleted."""
+        question, (red, green, blue) = self.create_poll(Question.MULTIPLE)
+        self.client.post(reverse("polls:vote", args=(question.id,)), {"choice": [blue.id]})
+        red.delete()
+        counts = {choice.choice_text: choice.num_votes for choice in question.result_choices()}
+        self.assertEqual({"Green": 0, "Blue": 1}, counts)
+        new = Choice.objects.create(question=question, choice_text="Yellow")
+        self.assertEqual(3, new.slot)
+
+    def test_deleted_choice_cannot_win_runoff(self):
+        """Ranked ballots skip the slots of deleted choices."""
+        question, (red, green, blue) = self.create_poll(Question.RANKED)
+        self.client.post(reverse("polls:vote", args=(question.id,)),
+                         {f"rank_{blue.id}": "1", f"rank_{red.id}": "2"})
+        blue.delete()
+        winners = [choice for choice in question.result_choices() if choice.is_winner]
+        self.assertEqual([red], winners)
+
+    def test_archived_ranked_poll_keeps_winner(self):
+        """The runoff winner is frozen into the snapshot of an archived ranked poll."""
+        question, (red, green, blue) = self.create_poll(Question.RANKED)
+        self.client.post(reverse("polls:vote", args=(question.id,)),
+                         {f"rank_{blue.id}": "1", f"rank_{red.id}": "2"})
+        question.end_date = timezone.now() - datetime.timedelta(minutes=1)
+        question.save()
+        call_command("archive_polls", stdout=StringIO())
+        question.refresh_from_db()
+        self.assertTrue(question.is_archived())
+        winners = [choice for choice in question.result_choices() if choice.is_winner]
+        self.assertEqual([blue], winners)
+        response = self.client.get(reverse("polls:results", args=(question.id,)))
+        self.assertContains(response, "Winner")
+
+    def test_fixtures_get_choice_slots(self):
+        """Choices loaded from the data fixtures get slots, also when loaded twice."""
+        for fixture in ("users.json", "polls.json", "polls.json"):
+            call_command("loaddata", settings.BASE_DIR / "data" / fixture, stdout=StringIO())
+        question = Question.objects.get(pk=2)
+        slots = list(question.choice_set.values_list("slot", flat=True))
+        self.assertEqual(list(range(len(slots))), slots)
+        self.assertEqual(len(slots), question.choice_slots)
+
+    def test_ballot_type_locked_once_voted(self):
+        """The admin refuses to change the ballot type of a poll with votes."""
+        question, (red, green, blue) = self.create_poll(Question.SINGLE)
+        data = {"question_text": question.question_text, "ballot_type": Question.MULTIPLE,
+                "pub_date": question.pub_date, "end_date": ""}
+        self.assertTrue(QuestionAdminForm(data, instance=question).is_valid())
+        Vote.objects.create(choice=red, user=self.user)
+        question.refresh_from_db()
+        self.assertIn("ballot_type", QuestionAdminForm(data, instance=question).errors)
+
+    def test_choice_limit_of_ballot_type(self):
+        """The admin refuses more choices than a multiple choice ballot can store."""
+        question, _ = self.create_poll(Question.MULTIPLE)
+        Question.objects.filter(pk=question.pk).update(choice_slots=tally.MAX_SELECT_CHOICES - 1)
+        question.refresh_from_db()
+        ChoiceFormSet = inlineformset_factory(Question, Choice, formset=ChoiceInlineFormSet,
+                                              fields=["choice_text"], extra=2)
+        data = {"choice_set-TOTAL_FORMS": "5", "choice_set-INITIAL_FORMS": "3"}
+        for n, choice in enumerate(question.choice_set.all()):
+            data[f"choice_set-{n}-id"] = str(choice.pk)
+            data[f"choice_set-{n}-choice_text"] = choice.choice_text
+        data["choice_set-3-choice_text"] = "Purple"
+        self.assertTrue(ChoiceFormSet(data, instance=question).is_valid())
+        data["choice_set-4-choice_text"] = "Orange"
+        self.assertFalse(ChoiceFormSet(data, instance=question).is_valid())
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pizza = create_question(question_text="Favourite pizza topping?", days=-2)
+        Choice.objects.create(question=self.pizza, choice_text="Pineapple")
+        self.fruit = create_question(question_text="Favourite fruit?", days=-1)
+        Choice.objects.create(question=self.fruit, choice_text="Pineapple pizza")
+
+    def test_prefix_search_ranks_question_text_first(self):
+        """Words match as prefixes, and question text beats choice text."""
+        results = search.search(Question.objects.all(), "piz")
+        self.assertEqual([self.pizza, self.fruit], results)
+        self.assertEqual([self.fruit], search.search(Question.objects.all(), "fav fru"))
+
+    def test_index_follows_edits_and_deletes(self):
+        """The index is updated when questions and choices change."""
+        self.fruit.question_text = "Favourite vegetable?"
+        self.fruit.save()
+        self.assertEqual([], search.search(Question.objects.all(), "fruit"))
+        self.fruit.choice_set.all().delete()
+        self.assertEqual([self.pizza], search.search(Question.objects.all(), "pizza"))
+        self.pizza.delete()
+        self.assertEqual([], search.search(Question.objects.all(), "pizza"))
+
+    def test_index_page_search(self):
+        """The index page lists the published polls matching ``q``."""
+        create_question(question_text="Future pizza?", days=5)
+        response = self.client.get(reverse("polls:index"), {"q": "pizza"})
+        self.assertEqual([self.pizza, self.fruit], response.context["latest_question_list"])
+        self.assertContains(response, 'value="pizza"')
+
+    def test_limit_applies_to_searched_questions_only(self):
+        """Better matches outside the searched questions do not use up the limit."""
+        for n in range(3):
+            create_question(question_text=f"Pizza pizza pizza {n}?", days=5)
+        published = Question.objects.filter(pub_date__lte=timezone.now())
+        self.assertEqual([self.pizza, self.fruit], search.search(published, "pizza", limit=2))
+
+    def test_admin_search(self):
+        """The admin search filters through the full-text index."""
+        model_admin = admin_site._registry[Question]
+        queryset, may_have_duplicates = model_admin.get_search_results(
+            None, Question.objects.all(), "pineapple pizza")
+        self.assertQuerysetEqual(queryset, [self.pizza, self.fruit], ordered=False)
+        self.assertFalse(may_have_duplicates)
+
+    def test_rebuild_search_index(self):
+        """The index can be rebuilt from scratch."""
+        output = StringIO()
+        call_command("rebuild_search_index", stdout=output)
+        self.assertIn("Indexed 2 polls.", output.getvalue())
+        self.assertEqual([self.fruit], search.search(Question.objects.all(), "fruit"))
+
+
+def increment_shared_counter(location, times, returning=True):
+    """Increment a counter in an SQLiteCache from another process."""
+    shared = SQLiteCache(location, {})
+    with mock.patch("polls.cache.HAS_RETURNING", returning):
+        for _ in range(times):
+            shared.incr("counter")
+
+
+class SQLiteCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.location = f"{self.cache_dir.name}/cache.sqlite3"
+        self.cache = SQLiteCache(self.location, {"OPTIONS": {"MAX_ENTRIES": 10}})
+
+    def test_set_get_and_delete(self):
+        """Values of any picklable type round-trip through the cache."""
+        self.cache.set("tuple", (1.5, "text"))
+        self.cache.set("number", 42)
+        self.assertEqual((1.5, "text"), self.cache.get("tuple"))
+        self.assertEqual(42, self.cache.get("number"))
+        self.assertTrue(self.cache.delete("tuple"))
+        self.assertIsNone(self.cache.get("tuple"))
+        self.assertEqual("default", self.cache.get("missing", "default"))
+
+    def test_expired_entries_are_missing(self):
+        """Entries are gone once their timeout has passed."""
+        self.cache.set("short", "value", timeout=0.05)
+        self.assertTrue(self.cache.has_key("short"))
+        time.sleep(0.1)
+        self.assertFalse(self.cache.has_key("short"))
+        self.assertIsNone(self.cache.get("short"))
+        self.assertTrue(self.cache.add("short", "again"))
+        self.assertFalse(self.cache.add("short", "not again"))
+        self.assertEqual("again", self.cache.get("short"))
+
+    def test_incr(self):
+        """incr() adds to an existing integer and fails for missing keys."""
+        self.cache.set("counter", 1)
+        self.assertEqual(3, self.cache.incr("counter", 2))
+        self.assertEqual(2, self.cache.decr("counter"))
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_incr_is_atomic_across_processes(self):
+        """Concurrent increments from several processes are never lost."""
+        self.cache.set("counter", 0, timeout=None)
+        context = multiprocessing.get_context("fork")
+        # Half of the workers use the fallback for SQLite without RETURNING.
+        workers = [context.Process(target=increment_shared_counter,
+                                   args=(self.location, 200, n % 2 == 0))
+                   for n in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(800, self.cache.get("counter"))
+
+    def test_incr_without_returning(self):
+        """incr() works on SQLite versions without UPDATE ... RETURNING."""
+        self.cache.set("counter", 1)
+        with mock.patch("polls.cache.HAS_RETURNING", False):
+            self.assertEqual(3, self.cache.incr("counter", 2))
+            with self.assertRaises(ValueError):
+                self.cache.incr("missing")
+
+    def test_least_recently_used_entries_are_culled(self):
+        """Once over MAX_ENTRIES, the least recently used entries go first."""
+        self.cache.set("hot", "value")
+        for n in range(120):
+            self.cache.set(f"key{n}", n)
+            # Age every entry but "hot", as if only "hot" was being read.
+            self.cache._connection().execute(
+                "UPDATE cache SET accessed = accessed - 1000 WHERE key != ?",
+                (self.cache.make_key("hot"),))
+        self.assertEqual("value", self.cache.get("hot"))
+        (count,) = self.cache._connection().execute("SELECT COUNT(*) FROM cache").fetchone()
+        self.assertLessEqual(count, 10 + 100)
+        self.assertIsNone(self.cache.get("key0"))
+
+
+@override_settings(PASSWORD_HASHER_COST=1000)
+class SignupAndLoginTests(TestCase):
+
+    def test_signup_hashes_password_once(self):
+        """Signing up hashes the password once and logs the new user in."""
+        encode = hashers.PBKDF2PasswordHasher.encode
+        with mock.patch.object(hashers.PBKDF2PasswordHasher, "encode",
+                               autospec=True, side_effect=encode) as encode_mock:
+            response = self.client.post(reverse("signup"), {
+                "username": "newuser",
+                "password1": "FatChance!42",
+                "password2": "FatChance!42",
+            })
+        self.assertRedirects(response, reverse("polls:index"))
+        self.assertEqual(1, encode_mock.call_count)
+        user = User.objects.get(username="newuser")
+        self.assertEqual(str(user.pk), self.client.session["_auth_user_id"])
+
+    def test_password_rehashed_on_login_when_cost_changes(self):
+        """Logging in upgrades a password hashed with an older cost."""
+        User.objects.create_user(username="olduser", password="FatChance!")
+        with self.settings(PASSWORD_HASHER_COST=2000):
+            self.assertTrue(self.client.login(username="olduser", password="FatChance!"))
+        algorithm, iterations, *_ = User.objects.get(username="olduser").password.split("$")
+        self.assertEqual(("pbkdf2_sha256", "2000"), (algorithm, iterations))
+
+
+class WarmUpTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        tracker.reset()
+        self.addCleanup(tracker.reset)
+
+    def test_warm_up_caches_open_poll_results(self):
+        """Warm-up runs every step and caches the results of open polls."""
+        question = create_question(question_text="Open poll", days=-1)
+        future = create_question(question_text="Future poll", days=5)
+        timings = warm_up()
+        self.assertEqual([step.__name__ for step in warmup.STEPS], list(timings))
+        self.assertIsNotNone(cache.get(results_cache_key(question.id)))
+        self.assertIsNone(cache.get(results_cache_key(future.id)))
+
+    def test_failed_step_does_not_stop_warm_up(self):
+        """A failing step is logged and the other steps still run."""
+        question = create_question(question_text="Open poll", days=-1)
+        with mock.patch.object(warmup, "STEPS", [mock.Mock(side_effect=RuntimeError,
+                                                           __name__="broken"),
+                                                 warmup.prefill_caches]):
+            with self.assertLogs("mysite.warmup", "WARNING"):
+                warm_up()
+        self.assertIsNotNone(cache.get(results_cache_key(question.id)))
+
+    def test_warm_up_inside_event_loop(self):
+        """ASGI servers may load the application inside a running event loop."""
+        async def load():
+            return warm_up()
+
+        steps = [warmup.resolve_urls, warmup.open_database, warmup.compile_templates]
+        with mock.patch.object(warmup, "STEPS", steps):
+            # The connection would be opened in a thread that ends right away.
+            self.assertEqual(["resolve_urls", "compile_templates"], list(asyncio.run(load())))
+
+    def test_asgi_warm_up_does_not_open_database(self):
+        """Loading mysite.asgi warms up without opening a connection in its thread."""
+        with mock.patch.object(warmup, "warm_up") as asgi_warm_up:
+            with override_settings(WARMUP_ON_LOAD=True):
+                import mysite.asgi
+                importlib.reload(mysite.asgi)
+        asgi_warm_up.assert_called_with(open_connection=False)
+        steps = [warmup.resolve_urls, warmup.open_database, warmup.compile_templates]
+        with mock.patch.object(warmup, "STEPS", steps):
+            timings = warm_up(open_connection=False)
+        self.assertEqual(["resolve_urls", "compile_templates"], list(timings))
+
+    @override_settings(WARMUP_PREFILL_POLLS=1)
+    def test_prefill_is_limited_to_newest_and_trending_polls(self):
+        """Only the newest and the trending open polls are cached ahead of time."""
+        oldest = create_question(question_text="Oldest poll", days=-3)
+        older = create_question(question_text="Older poll", days=-2)
+        newest = create_question(question_text="Newest poll", days=-1)
+        tracker.record_vote(oldest.id)
+        warmup.prefill_caches()
+        self.assertIsNotNone(cache.get(results_cache_key(newest.id)))
+        self.assertIsNotNone(cache.get(results_cache_key(oldest.id)))
+        self.assertIsNone(cache.get(results_cache_key(older.id)))
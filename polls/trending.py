@@ -0,0 +1,184 @@
+"""
+Trending polls ranking.
+
+Each vote for a question adds exp(rate * t) to its score, where t is the time
+of the vote and rate = ln(2) / POLLS_TRENDING_HALF_LIFE. Dividing by
+exp(rate * now) gives the exponentially decayed vote rate, and since every
+question is divided by the same factor, the ranking can be kept on the
+undecayed sum. That sum only ever grows, which makes updates O(1) and lets
+the top-K list be maintained incrementally. Scores are kept as logarithms to
+avoid overflow.
+
+The tracker keeps only the top-K list and the votes it has not saved yet in
+memory. Every POLLS_TRENDING_FLUSH_INTERVAL seconds a background thread
+merges those votes into the TrendingScore table and reloads the top-K
+recorded by all worker processes. A question outside the top-K is ranked by
+the votes this worker has seen since the last flush until the next one.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Question, TrendingScore
+
+logger = logging.getLogger(__name__)
+
+
+def logaddexp(a, b):
+    """Returns log(exp(a) + exp(b)) without overflowing."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def decay_rate():
+    """Returns the decay rate per second of the trending scores."""
+    return math.log(2) / settings.POLLS_TRENDING_HALF_LIFE
+
+
+class TrendingTracker:
+    """In-memory top-K list of the trending questions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all scores; they are reloaded from the database on next use."""
+        with self._lock:
+            self._pending = {}
+            self._top = []
+            self._loaded = False
+            self._flushing = False
+            self._last_flush = time.time()
+
+    def record_vote(self, question_id, now=None):
+        """
+        Add a vote to the score of a question.
+
+        Args:
+            question_id: The ID of the question voted on.
+            now: The time of the vote in seconds, for testing.
+        """
+        now = time.time() if now is None else now
+        self._ensure_loaded()
+        weight = decay_rate() * now
+        with self._lock:
+            pending = logaddexp(self._pending.get(question_id), weight)
+            self._pending[question_id] = pending
+            self._update_top(question_id, weight, pending)
+            since_flush = now - self._last_flush
+            flush_due = since_flush >= settings.POLLS_TRENDING_FLUSH_INTERVAL
+            flush_due = flush_due and not self._flushing
+            if flush_due:
+                self._flushing = True
+        if flush_due:
+            # Votes never wait for the database write of the flush.
+            threading.Thread(target=self._background_flush, daemon=True).start()
+
+    def _update_top(self, question_id, weight, pending):
+        """
+        Add a vote to the top-K list. A question outside the list is only
+        known by its pending votes, which is enough to move it in.
+        """
+        top = self._top
+        for i, (score, top_id) in enumerate(top):
+            if top_id == question_id:
+                top[i] = (logaddexp(score, weight), question_id)
+                break
+        else:
+            if len(top) < settings.POLLS_TRENDING_SIZE:
+                top.append((pending, question_id))
+            elif pending > top[-1][0]:
+                top[-1] = (pending, question_id)
+            else:
+                return
+        top.sort(reverse=True)
+
+    def top(self, now=None):
+        """
+        Returns the trending questions as (question_id, score) pairs, best
+        first, where score is the decayed number of votes.
+        """
+        now = time.time() if now is None else now
+        self._ensure_loaded()
+        offset = decay_rate() * now
+        with self._lock:
+            return [(question_id, math.exp(score - offset)) for score, question_id in self._top]
+
+    def top_ids(self):
+        """Returns the IDs of the trending questions, best first."""
+        return [question_id for question_id, _ in self.top()]
+
+    def _background_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.warning("Saving the trending scores failed", exc_info=True)
+        finally:
+            connection.close()
+            with self._lock:
+                self._flushing = False
+
+    def flush(self, now=None):
+        """Merge the pending votes into the database and reload the top-K."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time() if now is None else now
+        try:
+            self._save(pending)
+        except Exception:
+            # Keep the votes for the next flush.
+            with self._lock:
+                for question_id, score in pending.items():
+                    self._pending[question_id] = logaddexp(
+                        self._pending.get(question_id), score)
+            raise
+        self._load()
+
+    def _save(self, pending):
+        """Add pending scores to the stored ones."""
+        if pending:
+            with transaction.atomic():
+                existing = set(Question.objects.filter(pk__in=pending)
+                               .values_list("pk", flat=True))
+                stored = dict(TrendingScore.objects.filter(question__in=existing)
+                              .values_list("question", "log_score"))
+                TrendingScore.objects.bulk_create(
+                    [TrendingScore(question_id=question_id,
+                                   log_score=logaddexp(stored.get(question_id), score))
+                     for question_id, score in pending.items() if question_id in existing],
+                    update_conflicts=True,
+                    unique_fields=["question"],
+                    update_fields=["log_score"],
+                )
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._load()
+
+    def _load(self):
+        """Rebuild the top-K list from the stored top-K and the pending votes."""
+        size = settings.POLLS_TRENDING_SIZE
+        with self._lock:
+            pending_ids = list(self._pending)
+        stored = TrendingScore.objects.values_list("question", "log_score")
+        scores = dict(stored.order_by("-log_score")[:size])
+        scores.update(stored.filter(question__in=pending_ids))
+        with self._lock:
+            for question_id, score in self._pending.items():
+                scores[question_id] = logaddexp(scores.get(question_id), score)
+            self._top = heapq.nlargest(
+                size, ((score, question_id) for question_id, score in scores.items()))
+            self._loaded = True
+
+
+tracker = TrendingTracker()
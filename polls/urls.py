@@ -1,10 +1,15 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# POLLS_ASYNC_VIEWS selects the native async variants of the polls views.
+poll_views = async_views if settings.POLLS_ASYNC_VIEWS else views
 
 app_name = "polls"
 urlpatterns = [
-    path("", views.index, name="index"),
-    path('detail/<int:pk>/', views.detail, name='detail'),
-    path('results/<int:question_id>/', views.results, name='results'),
-    path("<int:question_id>/vote/", views.vote, name="vote"),
+    path("", poll_views.index, name="index"),
+    path('detail/<int:pk>/', poll_views.detail, name='detail'),
+    path('results/<int:question_id>/', poll_views.results, name='results'),
+    path("<int:question_id>/vote/", poll_views.vote, name="vote"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
@@ -1,4 +1,4 @@
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 from django.views import generic
@@ -6,22 +6,98 @@ from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required  # Import the login_required decorator
 from django.contrib.auth import logout  # Import the logout function
-from django.contrib.auth import login, authenticate
+from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
+from django.conf import settings
+from django.core.cache import cache
 
-from .models import Choice, Question, Vote
+from . import admission, search, tally, trending
+from .admission import admission_control
+from .models import Ballot, Choice, Question, Vote
+
+
+def results_cache_key(question_id):
+    """Returns the cache key of the results of a question."""
+    return f"polls:results:{question_id}"
+
+
+def cached_result_choices(question):
+    """
+    Returns the result choices of a question, computing and caching them
+    if they are not in the cache yet.
+    """
+    key = results_cache_key(question.id)
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(question.result_choices())
+        cache.set(key, choices, settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    return choices
+
+
+def detail_context(question):
+    """Returns the template context for 'polls/detail.html'."""
+    return {"question": question, "choices": question.choice_set.all()}
+
+
+def read_ballot(question, choices, data):
+    """
+    Reads a multiple or ranked choice ballot from the submitted vote form.
+
+    Args:
+        question: The Question voted on.
+        choices: The choices of the question.
+        data: The POST data of the vote form.
+
+    Returns:
+        The field values of the user's Ballot.
+
+    Raises:
+        ValueError: If the ballot is empty or invalid.
+    """
+    slots = {str(choice.pk): choice.slot for choice in choices}
+    if question.ballot_type == Question.MULTIPLE:
+        selected = [slots[pk] for pk in data.getlist("choice") if pk in slots]
+        if not selected:
+            raise ValueError("You didn't select a choice.")
+        return {"selection": tally.selection_mask(selected), "ranking": b""}
+
+    ranks = {}
+    for pk, slot in slots.items():
+        value = data.get(f"rank_{pk}", "").strip()
+        if not value:
+            continue
+        if not value.isdigit():
+            raise ValueError("Ranks must be positive numbers.")
+        if int(value) in ranks:
+            raise ValueError("Each rank can only be given to one choice.")
+        ranks[int(value)] = slot
+    if not ranks:
+        raise ValueError("You didn't rank any choice.")
+    return {"selection": 0, "ranking": tally.pack_ranking([ranks[rank] for rank in sorted(ranks)])}
 
 
 def index(request):
     """
-    Displays a list of the latest five published questions.
+    Displays a list of the published questions, newest first, or trending
+    first when the ``sort`` query parameter is "trending". The ``q`` query
+    parameter searches the questions instead, best match first.
 
     Returns:
         Rendered HTML page displaying the latest questions.
     """
-    latest_question_list = Question.objects.filter(pub_date__lte=timezone.now())\
-        .order_by('-pub_date')
-    context = {"latest_question_list": latest_question_list}
+    published = Question.objects.filter(pub_date__lte=timezone.now())
+    sort = request.GET.get("sort", "latest")
+    query = request.GET.get("q", "").strip()
+    if query:
+        latest_question_list = search.search(published, query)
+    elif sort == "trending":
+        trending_ids = trending.tracker.top_ids()
+        top = published.in_bulk(trending_ids)
+        latest_question_list = [top[pk] for pk in trending_ids if pk in top]
+        latest_question_list += published.exclude(pk__in=trending_ids).order_by('-pub_date')
+    else:
+        latest_question_list = published.order_by('-pub_date')
+    context = {"latest_question_list": latest_question_list, "sort": sort, "query": query}
     return render(request, "polls/index.html", context)
 
 
@@ -51,7 +127,7 @@ def detail(request, pk):
         messages.error(request, "Voting is not allowed for this poll.")
         return redirect('polls:index')
 
-    return render(request, "polls/detail.html", {"question": question})
+    return render(request, "polls/detail.html", detail_context(question))
 
 
 def results(request, question_id):
@@ -66,7 +142,8 @@ def results(request, question_id):
         Rendered HTML page displaying the question results.
     """
     question = get_object_or_404(Question, pk=question_id)
-    return render(request, 'polls/results.html', {'question': question})
+    choices = cached_result_choices(question)
+    return render(request, 'polls/results.html', {'question': question, 'choices': choices})
 
 
 class IndexView(generic.ListView):
@@ -106,15 +183,21 @@ class DetailView(generic.DetailView):
         if not question.can_vote():
             messages.error(request, "Voting is not allowed for this poll.")
             return redirect('polls:index')
-        return render(request, 'polls/detail.html', {'question': question})
+        return render(request, 'polls/detail.html', detail_context(question))
 
 
 class ResultsView(generic.DetailView):
     model = Question
     template_name = "polls/results.html"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["choices"] = self.object.result_choices()
+        return context
+
 
 @login_required
+@admission_control
 def vote(request, question_id):
     """Vote for one of the answers to a question."""
 
@@ -134,45 +217,71 @@ def vote(request, question_id):
 
     # Render 'detail.html' template with 'question' for GET requests.
     if request.method == "GET":
-        return render(request, 'polls/detail.html', {'question': question})
-
-    try:
-        # Get the selected choice from the POST data
-        selected_choice = question.choice_set.get(pk=request.POST["choice"])
-    except (KeyError, Choice.DoesNotExist):
-        # Re-show the voting form for the question if choice is not selected
-        messages.error(request, "You didn't select a choice.")
-        return render(request, 'polls/detail.html', {'question': question})
+        return render(request, 'polls/detail.html', detail_context(question))
 
     recently_user = request.user
 
-    try:
-        # Check if the user has already voted for this choice
-        vote = Vote.objects.get(user=recently_user, choice__question=question)
-        vote.choice = selected_choice
-    except Vote.DoesNotExist:
-        # Create a new vote for the selected choice and user
-        vote = Vote.objects.create(choice=selected_choice, user=recently_user)
-
-    vote.save()
-    messages.success(request, f"Your vote for {selected_choice} has been saved.")
+    if question.ballot_type != Question.SINGLE:
+        # Multiple and ranked choice votes are stored as one compact Ballot
+        try:
+            ballot = read_ballot(question, list(question.choice_set.all()), request.POST)
+        except ValueError as error:
+            messages.error(request, str(error))
+            return render(request, 'polls/detail.html', detail_context(question))
+        Ballot.objects.update_or_create(question=question, user=recently_user, defaults=ballot)
+        success_message = "Your ballot has been saved."
+    else:
+        try:
+            # Get the selected choice from the POST data
+            selected_choice = question.choice_set.get(pk=request.POST["choice"])
+        except (KeyError, ValueError, Choice.DoesNotExist):
+            # Re-show the voting form for the question if choice is not selected
+            messages.error(request, "You didn't select a choice.")
+            return render(request, 'polls/detail.html', detail_context(question))
+
+        try:
+            # Check if the user has already voted for this choice
+            vote = Vote.objects.get(user=recently_user, choice__question=question)
+            vote.choice = selected_choice
+        except Vote.DoesNotExist:
+            # Create a new vote for the selected choice and user
+            vote = Vote.objects.create(choice=selected_choice, user=recently_user)
+
+        vote.save()
+        success_message = f"Your vote for {selected_choice} has been saved."
+
+    cache.delete(results_cache_key(question.id))
+    trending.tracker.record_vote(question.id)
+    messages.success(request, success_message)
 
     # Redirect to the results page for the question
     return HttpResponseRedirect(reverse("polls:results", args=(question.id,)))
 
 
+def metrics(request):
+    """Exposes the vote admission counters in the Prometheus text format."""
+    counts = admission.metrics()
+    lines = [
+        "# TYPE polls_votes_admitted_total counter",
+        f"polls_votes_admitted_total {counts['admitted']}",
+        "# TYPE polls_votes_shed_total counter",
+        f'polls_votes_shed_total{{reason="overload"}} {counts["shed_overload"]}',
+        f'polls_votes_shed_total{{reason="rate_limited"}} {counts["shed_rate_limited"]}',
+        "# TYPE polls_votes_in_flight gauge",
+        f"polls_votes_in_flight {admission.inflight.count}",
+    ]
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4")
+
+
 def signup(request):
     """Register a new user."""
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
         if form.is_valid():
-            form.save()
-            # get named fields from the form data
-            username = form.cleaned_data.get('username')
-            # password input field is named 'password1'
-            raw_passwd = form.cleaned_data.get('password1')
-            user = authenticate(username=username, password=raw_passwd)
-            login(request, user)
+            # The new user is logged in directly; authenticating them again
+            # would hash the password a second time.
+            user = form.save()
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
             return redirect('polls:index')
     else:
         # create a user form and display it on the signup page